@@ -0,0 +1,101 @@
+import argparse
+import datetime
+import json
+import os
+import statistics
+import time
+from urllib.request import urlopen
+
+from benchmarks.mock_retailer import MockRetailer
+from benchmarks.parser_benchmark import git_commit
+from src.galaxus.page_selectors import SELECTORS as GALAXUS_SELECTORS
+from src.interdiscount.page_selectors import REQUIRED_ARTICLE_FIELDS, SELECTORS as INTERDISCOUNT_SELECTORS
+from src.utils.html_parser import parse_html
+from src.utils.web_driver_factory import DRIVER_PROFILES, WebDriverFactory
+
+# Loads the product pages of the mock retailer (with css, fonts, scripts, analytics and images) in a headless firefox
+# with every driver profile and reports the load time per page and whether the fields the scrapers read are still
+# rendered. Choose the fastest profile that renders all fields. Needs firefox and geckodriver, but no network.
+# Run it from the repository root: python -m benchmarks.driver_profile_benchmark [--pages 30 --latency 0.05]
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results', 'driver_profile_benchmark.jsonl')
+
+# fields of a product page that the scrapers read
+REQUIRED_FIELDS = {
+    'interdiscount': REQUIRED_ARTICLE_FIELDS,
+    'galaxus': [GALAXUS_SELECTORS[name] for name in ('article_name', 'price', 'description', 'specifications')],
+}
+
+
+def product_urls(retailer, site, pages):
+    # the product links of the listing of a category, repeated if the listing has fewer than pages links
+    if site == 'interdiscount':
+        soup = parse_html(urlopen(retailer.base_url + '/de/category/tv-und-audio?page=1').read())
+        links = [link.get('href') for link in INTERDISCOUNT_SELECTORS['listing_links'].select(soup)]
+    else:
+        soup = parse_html(urlopen(retailer.base_url + f'/en/s1/category/electronics?take={pages}').read())
+        links = [GALAXUS_SELECTORS['article_tile_link'].select_one(tile).get('href')
+                 for tile in GALAXUS_SELECTORS['article_tiles'].select(soup)]
+    return [retailer.base_url + link for link in (links * (pages // len(links) + 1))[:pages]]
+
+
+def measure(profile, urls, required_fields):
+    """
+    :return: Tuple of the load times of the pages (seconds) and the share of the pages that rendered all fields.
+    """
+    driver = WebDriverFactory.create_driver(profile=profile)
+    try:
+        driver.get(urls[0])  # warm up, e.g. the connection and the javascript engine
+        load_times = []
+        complete = 0
+        for url in urls:
+            start = time.perf_counter()
+            driver.get(url)
+            load_times.append(time.perf_counter() - start)
+            soup = parse_html(driver.page_source)
+            complete += all(selector.select_one(soup) is not None for selector in required_fields)
+        return load_times, complete / len(urls)
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--site", choices=["interdiscount", "galaxus"], nargs='+',
+                        default=["interdiscount", "galaxus"])
+    parser.add_argument("--profiles", choices=list(DRIVER_PROFILES), nargs='+', default=list(DRIVER_PROFILES))
+    parser.add_argument("--pages", type=int, default=30, help="product pages loaded per profile")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every response of the mock is delayed")
+    parser.add_argument("--no-save", action="store_true", help="do not append the results to the results file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'site':<14}{'profile':<10}{'mean ms':>10}{'p95 ms':>10}{'complete':>10}")
+    for site in args.site:
+        with MockRetailer(site, latency=args.latency, assets=True) as retailer:
+            urls = product_urls(retailer, site, args.pages)
+            fastest = None
+            for name in args.profiles:
+                load_times, complete = measure(DRIVER_PROFILES[name], urls, REQUIRED_FIELDS[site])
+                mean = statistics.mean(load_times)
+                p95 = sorted(load_times)[int(len(load_times) * 0.95) - 1] if len(load_times) > 1 else mean
+                results.append({'site': site, 'profile': name, 'mean_ms': round(mean * 1000, 1),
+                                'p95_ms': round(p95 * 1000, 1), 'complete': complete})
+                print(f"{site:<14}{name:<10}{mean * 1000:>10.1f}{p95 * 1000:>10.1f}{complete:>10.0%}")
+                if complete == 1 and (fastest is None or mean < fastest[1]):
+                    fastest = (name, mean)
+            if fastest:
+                print(f"fastest profile that renders all fields on {site}: {fastest[0]}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'commit': git_commit(), 'latency': args.latency,
+                                   'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                                   'results': results}) + "\n")
+        print(f"Results appended to {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
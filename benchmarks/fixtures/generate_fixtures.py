@@ -0,0 +1,97 @@
+import os
+import random
+
+# Writes the html fixtures of the parser benchmark. The pages are stripped down copies of the galaxus and interdiscount
+# pages: the markup the selectors in src/*/page_selectors.py look for, plus filler of about the size of the real
+# pages. Run it from the repository root after a selector changed: python -m benchmarks.fixtures.generate_fixtures
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+BRANDS = ['Sony', 'Apple', 'Samsung', 'LG', 'JBL', 'Bose', 'Lenovo', 'HP', 'Logitech', 'Philips', 'Bang & Olufsen',
+          'Sennheiser', 'Asus', 'Acer', 'Dell', 'Microsoft', 'Nintendo', 'Panasonic', 'Sonos', 'Xiaomi']
+PRODUCTS = ['Kopfhörer', 'Lautsprecher', 'Fernseher', 'Notebook', 'Maus', 'Tastatur', 'Monitor', 'Soundbar']
+LOREM = ("Dieses Produkt überzeugt mit hervorragender Qualität und einem modernen Design. Die lange Akkulaufzeit und "
+         "die einfache Bedienung machen es zum idealen Begleiter für den Alltag. ")
+
+
+def filler(blocks):
+    # navigation, scripts and footers that the real pages carry around the interesting markup
+    return "".join(f'<div class="filler-{i}"><span>{LOREM}</span><a href="/de/info/{i}">Info {i}</a></div>'
+                   for i in range(blocks))
+
+
+def page(body):
+    return f'<!DOCTYPE html><html lang="de"><head><meta charset="utf-8"><title>Fixture</title></head><body>{body}</body></html>'
+
+
+def product_slug(index):
+    brand = BRANDS[index % len(BRANDS)]
+    return f"{brand.lower().replace(' ', '-')}-{PRODUCTS[index % len(PRODUCTS)].lower()}-{1000 + index}"
+
+
+def interdiscount_pages():
+    navigation = "".join(f'<nav><ul><li><a href="/de/nav-{n}">Nav {n}</a></li></ul></nav>' for n in range(2))
+    listing_items = "".join(
+        f'<li><article><a href="/de/product/{product_slug(i)}--p{400000 + i}">{product_slug(i)}</a>'
+        f'<span>{random.randint(10, 3000)}.–</span></article></li>' for i in range(24))
+    pagination = "".join(f'<a href="?page={n}">{n}</a>' for n in range(1, 6)) + '<a href="?page=2">Weiter</a>'
+    yield 'listing', page(navigation + filler(150) + f'<ul data-testid="category-wrapper">{listing_items}</ul>'
+                          + f'<div>{pagination}</div>' + filler(50))
+
+    breadcrumb = "".join(f'<li><a href="/de/c{n}">Kategorie {n}</a></li>' for n in range(4))
+    yield 'product', page(
+        navigation + f'<nav><ol>{breadcrumb}</ol></nav>' + filler(120)
+        + '<h1><span>SONY WH-1000XM5 Kopfhörer</span></h1>'
+        + '<span data-testid="product-price"><span>349.–</span></span>'
+        + f'<div data-testid="text-clamp"><p>{LOREM * 8}</p></div>'
+        + '<div id="collapsible-reviews-controls"><div><div><div>4.6</div></div><div class="mr-4">4.6</div></div></div>'
+        + filler(60))
+
+    entries = "".join(f'<div><div><input type="checkbox"></div><div>{brand} ({random.randint(1, 400)})</div></div>'
+                      for brand in BRANDS * 3)
+    yield 'brand_filter', page(navigation + filler(150) + f'<fieldset><legend>Marken</legend><span></span>'
+                                                          f'<div>{entries}</div></fieldset>' + filler(50))
+
+    sub_categories = "".join(f'<li><a href="/de/category/sub-{n}">Unterkategorie {n}</a></li>' for n in range(40))
+    yield 'category', page(navigation + f'<nav><ul>{sub_categories}</ul></nav>' + filler(150))
+
+
+def galaxus_pages():
+    navigation = "".join(f'<li class="sc-ba0f659-0"><a href="/en/s{n}/category-{n}">Category {n}</a></li>'
+                         for n in range(20))
+    tiles = "".join(f'<article class="sc-328a7c4f-1 dBtYoI"><a href="/en/s1/product/{product_slug(i)}-{9000 + i}">'
+                    f'{product_slug(i)}</a><span>CHF {random.randint(10, 3000)}.–</span></article>'
+                    for i in range(204))
+    yield 'listing', page(f'<ul>{navigation}</ul>' + filler(100)
+                          + '<p class="sc-e1fe84e1-2 hZKDCk">1–204 of 204 products</p>' + tiles + filler(50))
+
+    specs = "".join(f'<a class="sc-972af934-0 hoQmUQ" href="/en/spec/{n}">{value}</a>'
+                    for n, value in enumerate(['Sony', 'Headphones', 'Bluetooth', 'Black']))
+    stars = ('<span class="sc-218358ee-2 sc-218358ee-3 jltNFx bFfwDd star_stars__LYfBH sc-d9dbbd3c-1 jsBVEW" '
+             'aria-label="4.5 out of 5 stars"></span>')
+    yield 'product', page(f'<ul>{navigation}</ul>' + filler(120) + '<h1>Sony WH-1000XM5</h1>'
+                          + '<button class="sc-d8df8e48-5 ccjwlK">CHF 349.–</button>'
+                          + f'<div class="sc-5a972e05-0 jzGCwC">{LOREM * 8}</div>' + specs
+                          + f'<div class="sc-98a81fa6-0 UIRot">{stars}</div>' + filler(60))
+
+    filter_items = "".join(f'<li><span class="sc-2b1c90df-1 kvYprx">{brand}</span>'
+                           f'<span class="sc-2b1c90df-2 dfAmFV">{random.randint(0, 400)}</span></li>'
+                           for brand in BRANDS * 3)
+    yield 'brand_filter', page(f'<ul>{navigation}</ul>' + filler(150)
+                               + f'<div id="bra"><ul class="sc-b9093e7f-7 iiBANC">{filter_items}</ul></div>' + filler(50))
+
+    sub_categories = "".join(f'<li><a href="/en/s1/producttype/sub-{n}">Subcategory {n}</a></li>' for n in range(40))
+    yield 'category', page(f'<ul>{navigation}</ul>' + filler(150)
+                           + f'<ul class="sc-1656bbdd-0 gQqszz">{sub_categories}</ul>' + filler(50))
+
+
+def main():
+    random.seed(42)
+    for site, pages in (('interdiscount', interdiscount_pages()), ('galaxus', galaxus_pages())):
+        os.makedirs(os.path.join(FIXTURE_DIR, site), exist_ok=True)
+        for name, html in pages:
+            with open(os.path.join(FIXTURE_DIR, site, f'{name}.html'), 'w', encoding='utf-8') as file:
+                file.write(html)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.fixtures.generate_fixtures import BRANDS, LOREM, PRODUCTS, filler, page
+
+# Local HTTP server that serves galaxus-like and interdiscount-like pages, so the scrapers can be load tested headless
+# and offline. The pages carry the markup the selectors in src/*/page_selectors.py look for (like the parser fixtures),
+# but they are generated per request: the category tree, the paginated listings, the brand filters and the product
+# pages are all derived from the url, so every run sees the same shop. Point a scraper at it with its base_url:
+#
+#   python -m benchmarks.mock_retailer --site interdiscount --port 8000 --latency 0.05
+#   python -m src.interdiscount.interdiscount_main --base-url http://127.0.0.1:8000 --async-fetch
+#
+# Or start it from a benchmark: with MockRetailer('galaxus', products=500) as retailer: ... retailer.base_url
+
+INTERDISCOUNT_CATEGORIES = ['Übersicht', 'TV & Audio', 'Computer & Gaming', 'Smartphone & Tablet', 'Haushalt',
+                            'Prospekt']
+GALAXUS_CATEGORIES = ['Electronics', 'Computing', 'Home & Kitchen', 'Toys', 'Sale', 'Used']
+
+# with assets=True, every page references what the real shops load around the html, see DriverProfile
+ASSET_TAGS = ('<link rel="stylesheet" href="/assets/site.css">'
+              '<script src="/analytics/gtm.js"></script>'
+              '<script src="/assets/app.js"></script>')
+ASSETS = {
+    '/assets/site.css': ('text/css', "@font-face { font-family: Shop; src: url(/assets/shop.woff2); } "
+                                     + ".tile { font-family: Shop, sans-serif; } " * 200),
+    '/assets/shop.woff2': ('font/woff2', 'F' * 60000),
+    '/assets/app.js': ('text/javascript', "var app = {};" + "/* bundle */" * 5000),
+    '/assets/product.jpg': ('image/jpeg', 'J' * 120000),
+    '/analytics/gtm.js': ('text/javascript', "var dataLayer = [];" + "/* tracking */" * 3000),
+}
+
+
+def slugify(text):
+    text = unicodedata.normalize('NFKD', text.replace('&', 'und')).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+class MockShop:
+    """
+    The assortment behind the mock pages. The products of a category are derived from a checksum of its path, so
+    every page can be rendered from its url alone, no matter which thread serves it or in which order they are
+    requested.
+    """
+
+    def __init__(self, products=120, sub_categories=4):
+        self.products = products
+        self.sub_categories = sub_categories
+
+    def category_id(self, path):
+        return 1000 + zlib.crc32(path.encode('utf-8')) % 9000
+
+    def product_ids(self, path):
+        first = self.category_id(path) * 100000
+        return range(first, first + self.products)
+
+    def sub_category_names(self, name):
+        return [f"{name} {PRODUCTS[i % len(PRODUCTS)]}" for i in range(self.sub_categories)]
+
+    def product(self, product_id):
+        brand = BRANDS[product_id % len(BRANDS)]
+        product_type = PRODUCTS[product_id // len(BRANDS) % len(PRODUCTS)]
+        generator = random.Random(product_id)
+        return {
+            'id': product_id,
+            'brand': brand,
+            'type': product_type,
+            'name': f"{brand.upper()} {product_type} {product_id % 10000}",
+            'slug': f"{slugify(brand)}-{slugify(product_type)}-{product_id % 10000}",
+            'price': generator.randint(10, 3000),
+            # some products have no reviews yet, like on the real shops
+            'rating': round(generator.uniform(1, 5), 1) if generator.random() < 0.8 else None,
+        }
+
+    def brand_counts(self, path):
+        counts = {}
+        for product_id in self.product_ids(path):
+            brand = BRANDS[product_id % len(BRANDS)]
+            counts[brand] = counts.get(brand, 0) + 1
+        return counts
+
+
+class InterdiscountPages:
+    """
+    Pages under /de/category/<top>/<sub>/... (category and listing, ?page=N) and /de/product/<slug>--p<id>.
+    """
+
+    def __init__(self, shop, page_size=24):
+        self._shop = shop
+        self._page_size = page_size
+        self._navigation = "".join(f'<nav><ul><li><a href="/de/nav-{n}">Nav {n}</a></li></ul></nav>' for n in range(2))
+
+    def render(self, path, query):
+        if path in ('', '/'):
+            return self._home()
+        if path.startswith('/de/category/'):
+            return self._category(path, int(query.get('page', ['1'])[-1]))  # the scraper appends &page=N
+        match = re.fullmatch(r'/de/product/[\w-]+--p(\d+)', path)
+        if match:
+            return self._product(int(match.group(1)))
+        return None
+
+    def _home(self):
+        items = "".join(f'<li><a href="/de/category/{slugify(name)}">{name}</a></li>'
+                        for name in INTERDISCOUNT_CATEGORIES)
+        return page('<button class="h-min">Akzeptieren</button>' + self._navigation + f'<nav><ul>{items}</ul></nav>'
+                    + filler(40))
+
+    def _category_names(self, path):
+        # the names of the categories on the path, e.g. ['TV & Audio', 'TV & Audio Kopfhörer']
+        slugs = path[len('/de/category/'):].strip('/').split('/')
+        names = [next((name for name in INTERDISCOUNT_CATEGORIES if slugify(name) == slugs[0]), slugs[0])]
+        for slug in slugs[1:]:
+            names.append(next((name for name in self._shop.sub_category_names(names[-1]) if slugify(name) == slug),
+                              slug))
+        return names
+
+    def _category(self, path, page_number):
+        path = path.rstrip('/')
+        names = self._category_names(path)
+        # the sub category navigation starts with 'Alle Kategorien' and the parent categories, which the scraper
+        # skips (2 + depth links), and only the first two levels have sub categories
+        parents = '<li><a href="/de/category">Alle Kategorien</a></li>' + "".join(
+            f'<li><a href="/de/category/{slugify(name)}">{name}</a></li>' for name in names)
+        children = "".join(f'<li><a href="{path}/{slugify(name)}">{name}</a></li>'
+                           for name in self._shop.sub_category_names(names[-1])) if len(names) < 3 else ''
+
+        product_ids = list(self._shop.product_ids(path))
+        pages = max(1, math.ceil(len(product_ids) / self._page_size))
+        page_number = min(max(page_number, 1), pages)
+        tiles = ""
+        for product_id in product_ids[(page_number - 1) * self._page_size:page_number * self._page_size]:
+            product = self._shop.product(product_id)
+            tiles += (f'<li><article><a href="/de/product/{product["slug"]}--p{product_id}">{product["name"]}</a>'
+                      f'<span>{product["price"]}.–</span></article></li>')
+        # like the real pagination: the first pages, the last page and 'Weiter'
+        pagination = "".join(f'<a href="?page={n}">{n}</a>' for n in sorted({*range(1, min(pages, 3) + 1), pages}))
+        if page_number < pages:
+            pagination += f'<a href="?page={page_number + 1}">Weiter</a>'
+
+        entries = "".join(f'<div aria-label="{brand}"><div><input type="checkbox"></div><div>{brand} ({count})</div>'
+                          f'</div>' for brand, count in sorted(self._shop.brand_counts(path).items()))
+        brand_filter = ('<button><span>Marken</span></button><div aria-label="Optionen wählen">'
+                        f'<fieldset><legend>Marken</legend><span></span><div>{entries}</div></fieldset></div>'
+                        '<button aria-label="Filter anwenden">Filter anwenden</button>')
+        return page(self._navigation + f'<nav><ul>{parents}{children}</ul></nav>' + brand_filter + filler(100)
+                    + f'<ul data-testid="category-wrapper">{tiles}</ul><div>{pagination}</div>' + filler(30))
+
+    def _product(self, product_id):
+        product = self._shop.product(product_id)
+        breadcrumb = "".join(f'<li><a href="/de/c{n}">{name}</a></li>'
+                             for n, name in enumerate(['Home', product['type'], product['name']]))
+        if product['rating'] is None:
+            reviews = '<div><p>Es liegen noch keine Bewertungen vor</p></div>'
+        else:
+            reviews = (f'<div><div><div><div>{product["rating"]}</div></div>'
+                       f'<div class="mr-4">{product["rating"]}</div></div></div>')
+        return page(self._navigation + f'<nav><ol>{breadcrumb}</ol></nav>' + filler(80)
+                    + f'<h1><span>{product["name"]}</span></h1>'
+                    + f'<span data-testid="product-price"><span>{product["price"]}.–</span></span>'
+                    + f'<div data-testid="text-clamp"><p>{LOREM * 6}</p></div>'
+                    + '<button id="collapsible-reviews">Bewertungen</button>'
+                    + f'<div id="collapsible-reviews-controls">{reviews}</div>' + filler(40))
+
+
+class GalaxusPages:
+    """
+    Pages under /en/s1/category/<name> (category and listing, ?take=N) and /en/s1/product/<slug>-<id>.
+
+    Like on galaxus, Apply navigates to ?filter=<checked filters>, so the scraper can append &take=N to the url.
+    The filters are only carried in the url, the listing always shows all products of the category.
+    """
+    _first_take = 24  # tiles on the listing without take=
+
+    # the category and brand filters are rendered into the same panel by the buttons, like on galaxus. the checked
+    # filters are kept across the pages in the filter parameter of the url
+    _filter_script = """
+    <script>
+    var SELECTED = new URLSearchParams(location.search).get('filter');
+    SELECTED = SELECTED ? SELECTED.split(',') : [];
+    function showFilter(id) { document.getElementById('filter-panel').innerHTML = FILTERS[id]; }
+    document.addEventListener('click', function (event) {
+        var checkbox = event.target.closest('[data-filter]');
+        if (!checkbox) { return; }
+        var key = checkbox.dataset.filter + '=' + checkbox.dataset.value;
+        var index = SELECTED.indexOf(key);
+        if (index < 0) { SELECTED.push(key); } else { SELECTED.splice(index, 1); }
+    });
+    function applyFilters() {
+        location.href = location.pathname + '?filter=' + encodeURIComponent(SELECTED.join(','));
+    }
+    </script>
+    """
+
+    def __init__(self, shop):
+        self._shop = shop
+        self._navigation = "<ul>" + "".join(f'<li class="sc-ba0f659-0"><a href="/en/s1/category/{slugify(name)}">'
+                                            f'{name}</a></li>' for name in GALAXUS_CATEGORIES) + "</ul>"
+
+    def render(self, path, query):
+        if path in ('', '/'):
+            return page(self._navigation + filler(40))
+        if path.startswith('/en/s1/category/') and '&' not in path:  # &take=N without a query is not a listing
+            return self._category(path.rstrip('/'), int(query.get('take', [self._first_take])[-1]))
+        match = re.fullmatch(r'/en/s1/product/[\w-]+-(\d+)', path)
+        if match:
+            return self._product(int(match.group(1)))
+        return None
+
+    def _filter(self, element_id, counts):
+        items = "".join(f'<li><span class="checkbox" data-filter="{element_id}" data-value="{escape(name)}"></span>'
+                        f'<span class="sc-2b1c90df-1 kvYprx">{name}</span>'
+                        f'<span class="sc-2b1c90df-2 dfAmFV">{count}</span></li>' for name, count in counts.items())
+        return f'<div id="{element_id}"><ul class="sc-b9093e7f-7 iiBANC">{items}</ul></div>'
+
+    def _category(self, path, take):
+        slug = path.rsplit('/', 1)[-1]
+        name = next((name for name in GALAXUS_CATEGORIES if slugify(name) == slug), slug)
+        sub_categories = self._shop.sub_category_names(name)
+        product_ids = list(self._shop.product_ids(path))
+
+        links = "".join(f'<li><a href="{path}-{slugify(sub_category)}">{sub_category}</a></li>'
+                        for sub_category in sub_categories)
+        filters = {
+            'pt': self._filter('pt', {sub_category: len(product_ids) // len(sub_categories)
+                                      for sub_category in sub_categories}),
+            'bra': self._filter('bra', dict(sorted(self._shop.brand_counts(path).items()))),
+        }
+        filter_bar = ('<button aria-label="Category" onclick="showFilter(\'pt\')">Category</button>'
+                      '<button aria-label="Brand" onclick="showFilter(\'bra\')">Brand</button>'
+                      '<div id="filter-panel"></div>'
+                      '<button class="sc-162db2fb-0 myuCZ sc-162db2fb-1 sc-7707229f-2 kRbzeV eCnljM" '
+                      'onclick="applyFilters()">Apply</button>'
+                      + self._filter_script.replace('<script>', f'<script>var FILTERS = {json.dumps(filters)};'))
+
+        shown = product_ids[:min(take, len(product_ids))]
+        tiles = ""
+        items = []
+        for position, product_id in enumerate(shown, 1):
+            product = self._shop.product(product_id)
+            link = f'/en/s1/product/{product["slug"]}-{product_id}'
+            tiles += (f'<article class="sc-328a7c4f-1 dBtYoI"><a href="{link}">{product["name"]}</a>'
+                      f'<span>CHF {product["price"]}.–</span></article>')
+            items.append({'@type': 'ListItem', 'position': position, 'url': link})
+        structured_data = json.dumps({'@context': 'https://schema.org', '@type': 'ItemList',
+                                      'itemListElement': items})
+        return page(self._navigation + f'<ul class="sc-1656bbdd-0 gQqszz">{links}</ul>' + filter_bar + filler(60)
+                    + f'<p class="sc-e1fe84e1-2 hZKDCk">1–{len(shown)} of {len(product_ids)} products</p>' + tiles
+                    + f'<script type="application/ld+json">{structured_data}</script>' + filler(30))
+
+    def _product(self, product_id):
+        product = self._shop.product(product_id)
+        specs = "".join(f'<a class="sc-972af934-0 hoQmUQ" href="/en/spec/{n}">{value}</a>'
+                        for n, value in enumerate([product['brand'], product['type'], 'Black']))
+        rating = '' if product['rating'] is None else (
+            '<span class="sc-218358ee-2 sc-218358ee-3 jltNFx bFfwDd star_stars__LYfBH sc-d9dbbd3c-1 jsBVEW" '
+            f'aria-label="{product["rating"]} out of 5 stars"></span>')
+        return page(self._navigation + filler(80) + f'<h1>{product["name"]}</h1>'
+                    + f'<button class="sc-d8df8e48-5 ccjwlK">CHF {product["price"]}.–</button>'
+                    + f'<div class="sc-5a972e05-0 jzGCwC">{LOREM * 6}</div>'
+                    + '<button data-test="ShowMoreToggleButton-description">Show more</button>'
+                    + f'<div id=":R5ct9e6d1tm:">{specs}</div>'
+                    + '<button data-test="showMoreButton-specifications">Show all specifications</button>'
+                    + f'<div class="sc-98a81fa6-0 UIRot">{rating}</div>' + filler(40))
+
+
+class MockRetailer:
+    """
+    Serves the pages of one mock shop on a ThreadingHTTPServer (one thread per connection, like many clients).
+
+    :param site: 'interdiscount' or 'galaxus', the markup the pages carry.
+    :param port: 0 picks a free port, see base_url.
+    :param latency: Seconds every response is delayed, plus up to jitter seconds at random, to simulate the network
+    and the rendering time of the real shop.
+    :param products: Number of products in every category.
+    :param sub_categories: Number of sub categories per category.
+    :param page_size: Articles per interdiscount listing page.
+    :param assets: Whether the pages load a stylesheet, a web font, scripts, analytics and a product image.
+    """
+
+    def __init__(self, site='interdiscount', host='127.0.0.1', port=0, latency=0.0, jitter=0.0, products=120,
+                 sub_categories=4, page_size=24, assets=False):
+        shop = MockShop(products, sub_categories)
+        self._pages = InterdiscountPages(shop, page_size) if site == 'interdiscount' else GalaxusPages(shop)
+        self._latency = latency
+        self._jitter = jitter
+        self._assets = assets
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        retailer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real shops
+
+            def do_GET(self):
+                retailer._respond(self)
+
+            def log_message(self, format, *args):
+                pass  # one line per request would distort the measurements
+
+        return Handler
+
+    def _respond(self, handler):
+        with self._lock:
+            self.requests += 1
+        if self._latency or self._jitter:
+            time.sleep(self._latency + random.uniform(0, self._jitter))
+
+        url = urlsplit(handler.path)
+        content_type = 'text/html; charset=utf-8'
+        if self._assets and url.path in ASSETS:
+            content_type, html = ASSETS[url.path]
+        else:
+            html = self._pages.render(url.path, parse_qs(url.query))
+            if html is not None and self._assets:
+                html = html.replace('</head>', ASSET_TAGS + '</head>').replace(
+                    '</body>', '<img src="/assets/product.jpg" alt="Product"></body>')
+        status = 200 if html is not None else 404
+        body = (html or page('<h1>Not found</h1>')).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self):
+        # serves in a background thread, e.g. next to a benchmark in the same process
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-retailer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--site", choices=["interdiscount", "galaxus"], default="interdiscount")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay of up to this many seconds")
+    parser.add_argument("--products", type=int, default=120, help="products per category")
+    parser.add_argument("--sub-categories", type=int, default=4, help="sub categories per category")
+    parser.add_argument("--page-size", type=int, default=24, help="articles per interdiscount listing page")
+    parser.add_argument("--assets", action="store_true", help="pages load css, fonts, scripts, analytics and images")
+    args = parser.parse_args()
+
+    retailer = MockRetailer(args.site, args.host, args.port, args.latency, args.jitter, args.products,
+                            args.sub_categories, args.page_size, args.assets)
+    print(f"Serving a mock {args.site} on {retailer.base_url} (Ctrl+C to stop)")
+    try:
+        retailer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{retailer.requests} requests served")
+
+
+if __name__ == "__main__":
+    main()
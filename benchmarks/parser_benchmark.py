@@ -0,0 +1,138 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from src.galaxus.scraper import Scraper as GalaxusScraper
+from src.interdiscount.scraper import Scraper as InterdiscountScraper
+from src.utils.html_parser import PARSER_BACKEND, parse_html
+
+# Times every parsing function of the scrapers on the html fixtures in benchmarks/fixtures (no browser, no network).
+# Each run is appended to benchmarks/results/parser_benchmark.jsonl together with the git commit, and compared with
+# the last run of another commit, so regressions between commits are visible.
+# Run it from the repository root: python -m benchmarks.parser_benchmark [--seconds 1]
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results', 'parser_benchmark.jsonl')
+
+
+def parser_scraper(scraper_class, base_url):
+    # the parsing functions do not need a driver, so the scrapers are created without starting firefox
+    scraper = scraper_class.__new__(scraper_class)
+    scraper._base_url = base_url
+    return scraper
+
+
+def benchmark_cases():
+    interdiscount = parser_scraper(InterdiscountScraper, "http://www.interdiscount.ch")
+    galaxus = parser_scraper(GalaxusScraper, "http://www.galaxus.ch")
+    # (site, fixture, function name, function of the parsed page)
+    return [
+        ('interdiscount', 'listing', '_get_article_links', lambda soup: list(interdiscount._get_article_links(soup))),
+        ('interdiscount', 'listing', '_count_listing_pages', interdiscount._count_listing_pages),
+        ('interdiscount', 'product', '_get_price', interdiscount._get_price),
+        ('interdiscount', 'product', '_get_description', interdiscount._get_description),
+        ('interdiscount', 'brand_filter', '_get_all_brands', interdiscount._parse_brands),
+        ('interdiscount', 'category', '_get_sub_categories', interdiscount._parse_sub_categories),
+        ('galaxus', 'listing', '_harvest_article_links', galaxus._harvest_article_links),
+        ('galaxus', 'product', '_parse_specifications', lambda soup: galaxus._parse_specifications(soup, None)),
+        ('galaxus', 'product', '_parse_rating', galaxus._parse_rating),
+        ('galaxus', 'product', '_parse_article', lambda soup: galaxus._parse_article(soup, None)),
+        ('galaxus', 'brand_filter', '_get_all_brands', galaxus._parse_brands),
+        ('galaxus', 'category', '_get_subcategories', galaxus._parse_subcategories),
+    ]
+
+
+def load_fixture(site, name):
+    with open(os.path.join(FIXTURE_DIR, site, f'{name}.html'), encoding='utf-8') as file:
+        return file.read()
+
+
+def measure(func, argument, seconds):
+    """
+    :return: Tuple of the calls per second and the peak memory that one call allocates (KiB).
+    """
+    func(argument)  # warm up, e.g. the selector caches
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func(argument)
+        calls += 1
+    pages_per_second = calls / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pages_per_second, peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(commit):
+    # results of the last run of another commit, by function
+    if not os.path.exists(RESULTS_PATH):
+        return {}
+    with open(RESULTS_PATH, encoding='utf-8') as file:
+        runs = [json.loads(line) for line in file if line.strip()]
+    for run in reversed(runs):
+        if run['commit'] != commit:
+            return {(result['site'], result['function']): result for result in run['results']}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1, help="how long each function is timed")
+    parser.add_argument("--no-save", action="store_true", help="do not append the results to the results file")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    baseline = previous_results(commit)
+    soups = {}
+    results = []
+
+    print(f"parser backend: {PARSER_BACKEND}, commit: {commit}")
+    print(f"{'site':<14}{'function':<28}{'pages/s':>12}{'peak KiB':>10}{'change':>10}")
+    for site, fixture, name, func in [(site, fixture, 'parse_html', parse_html)
+                                      for site in ('interdiscount', 'galaxus')
+                                      for fixture in ('listing', 'product', 'brand_filter', 'category')] \
+                                     + benchmark_cases():
+        html = load_fixture(site, fixture)
+        if name == 'parse_html':
+            name = f'parse_html[{fixture}]'
+            argument = html
+        else:
+            argument = soups.setdefault((site, fixture), parse_html(html))
+        pages_per_second, peak_kib = measure(func, argument, args.seconds)
+        results.append({'site': site, 'function': name, 'fixture': fixture,
+                        'pages_per_second': round(pages_per_second, 1), 'peak_kib': round(peak_kib, 1)})
+
+        change = ''
+        previous = baseline.get((site, name))
+        if previous:
+            change = f"{(pages_per_second / previous['pages_per_second'] - 1) * 100:+.1f}%"
+        print(f"{site:<14}{name:<28}{pages_per_second:>12,.0f}{peak_kib:>10.1f}{change:>10}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'commit': commit, 'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                                   'python': platform.python_version(), 'parser': PARSER_BACKEND,
+                                   'results': results}) + "\n")
+        print(f"Results appended to {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
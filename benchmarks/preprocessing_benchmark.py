@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from src.interdiscount.preprocessor import PreProcessor
+from src.utils.translation_cache import TranslationCache
+from src.utils.translator_backend import LocalTranslatorBackend
+
+# Compares the row by row preprocessing (iterrows + df.loc) with the column mode on a raw.csv.
+# Run it from the repository root: python -m benchmarks.preprocessing_benchmark [--rows 100000] [--file data/raw.csv]
+
+BRANDS = ['Sony', 'Apple', 'Samsung', 'LG', 'JBL', 'Bose', 'Lenovo', 'HP', 'Logitech', 'Philips']
+PRODUCTS = ['Kopfhörer', 'Lautsprecher', 'Fernseher', 'Notebook', 'Maus', 'Tastatur', 'Monitor', 'Soundbar']
+
+
+def write_synthetic_raw_csv(path, rows):
+    # rows like the interdiscount scraper writes them, about a third without a brand
+    random.seed(42)
+    data = []
+    for i in range(rows):
+        brand = random.choice(BRANDS)
+        product = random.choice(PRODUCTS)
+        data.append({
+            "name": f"{'- ' if i % 7 == 0 else ''}{brand.upper()} {product} {random.randint(100, 9999)} Pro",
+            "price": round(random.uniform(10, 3000), 2),
+            "description": f"* {product} von {brand}. Modell {i % 500}.",
+            "category": random.choice(['TV & Audio', 'Computer & Gaming']),
+            "rating": round(random.uniform(1, 5), 1),
+            "brand": '' if i % 3 == 0 else brand,
+            "sub_category": product
+        })
+    pd.DataFrame(data).to_csv(path, sep='|', index=False)
+
+
+def measure(func, df):
+    start = time.perf_counter()
+    result = func(df.copy())
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of the synthetic raw.csv")
+    parser.add_argument("--file", default=None, help="use this raw.csv instead of a synthetic one")
+    parser.add_argument("--no-ner", action="store_true", help="skip the spaCy NER (no model needed)")
+    parser.add_argument("--row-mode-rows", type=int, default=None,
+                        help="only run the (slow) row mode on the first n rows, the speedup compares rows/s then")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp_dir, 'raw.csv')
+            write_synthetic_raw_csv(path, args.rows)
+        processor = PreProcessor(path, translator=LocalTranslatorBackend(),
+                                 translation_cache=TranslationCache(os.path.join(tmp_dir, 'translations.sqlite')))
+        df = processor.df
+        print(f"Preprocessing {len(df)} rows of {path}")
+
+        # the NER is memoized and the same for both modes, so it runs once before the measurements
+        candidates = processor._extract_uppercase_column(processor._clean_column(df['name']))
+        if args.no_ner:
+            processor._recognized_brands.update(dict.fromkeys(candidates.unique()))
+        else:
+            processor._recognize_brands(candidates.unique())
+
+        column_time, column_result = measure(processor._process_columns, df)
+        print(f"column mode: {column_time:.2f}s ({len(df) / column_time:,.0f} rows/s)")
+        row_df = df.head(args.row_mode_rows) if args.row_mode_rows else df
+        row_time, row_result = measure(processor._process_rows, row_df)
+        print(f"row mode:    {row_time:.2f}s ({len(row_df) / row_time:,.0f} rows/s, {len(row_df)} rows)")
+        print(f"speedup:     {(len(df) / column_time) / (len(row_df) / row_time):.1f}x")
+
+        columns = ['brand', 'name', 'description']
+        if not row_result[columns].fillna('').equals(column_result.head(len(row_df))[columns].fillna('')):
+            print("WARNING: the results of the two modes differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,36 @@
+import argparse
+
 #from src.galaxus.preprocessor import PreProcessor
 from src.galaxus.scraper import Scraper
+from src.utils.scrape_run import run_scrape
+from src.utils.web_driver_factory import DRIVER_PROFILES
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of browsers that extract the article details in parallel")
+    parser.add_argument("--cache-dir", default=None,
+                        help="keep the fetched pages in this directory and reuse them in later runs")
+    parser.add_argument("--replay", action="store_true",
+                        help="serve all cached pages from --cache-dir without fetching them again, pages that are "
+                             "not cached are skipped (the category pages with the filters are still loaded live)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last run where it stopped instead of starting from scratch")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                        help="parquet writes typed columns, partitioned by source and scrape date")
+    parser.add_argument("--base-url", default="http://www.galaxus.ch",
+                        help="shop to scrape, e.g. the local mock of benchmarks/mock_retailer.py")
+    parser.add_argument("--driver-profile", choices=list(DRIVER_PROFILES), default="default",
+                        help="how the browser loads pages, see benchmarks/driver_profile_benchmark.py for their speed")
+    parser.add_argument("--category-ttl", type=float, default=24,
+                        help="hours until the cached category tree is refreshed (0 always refreshes it)")
+    return parser.parse_args()
 
 def main():
-    scraper = Scraper("http://www.galaxus.ch")
-    scraper.scrape()
+    args = parse_args()
+    run_scrape('galaxus', Scraper, args.base_url, workers=args.workers, cache_dir=args.cache_dir, replay=args.replay,
+               resume=args.resume, output_format=args.output_format, category_ttl=args.category_ttl,
+               driver_profile=args.driver_profile)
     # preprocessor = PreProcessor("data\\raw.csv")
     # preprocessor.process()
 
@@ -0,0 +1,27 @@
+from src.utils.html_parser import compile_selectors
+
+# All CSS selectors of the galaxus pages, compiled once
+SELECTORS = compile_selectors({
+    # home and category pages
+    'navigation_items': 'li.sc-ba0f659-0',
+    'sub_category_list': 'ul.sc-1656bbdd-0.gQqszz',
+    # brand and category filters
+    'filter_list': 'ul.sc-b9093e7f-7.iiBANC',
+    'filter_items': 'ul.sc-b9093e7f-7.iiBANC li',
+    'filter_name': 'span.sc-2b1c90df-1.kvYprx',
+    'filter_count': 'span.sc-2b1c90df-2.dfAmFV',
+    # listing
+    'product_count': 'p.sc-e1fe84e1-2.hZKDCk',
+    'article_tiles': 'article.sc-328a7c4f-1.dBtYoI',
+    'article_tile_link': 'a[href]',
+    'structured_data': 'script[type="application/ld+json"]',
+    # product pages
+    'show_more_specifications': "button[data-test='showMoreButton-specifications']",
+    'show_more_description': "button[data-test='ShowMoreToggleButton-description']",
+    'specifications': 'a.sc-972af934-0.hoQmUQ',
+    'article_name': 'h1',
+    'price': 'button.sc-d8df8e48-5.ccjwlK',
+    'description': 'div.sc-5a972e05-0.jzGCwC',
+    'rating_area': 'div.sc-98a81fa6-0.UIRot',
+    'rating_stars': 'span.sc-218358ee-2.sc-218358ee-3.jltNFx.bFfwDd.star_stars__LYfBH.sc-d9dbbd3c-1.jsBVEW',
+})
@@ -1,73 +1,79 @@
-import time
-import pandas as pd
-from bs4 import BeautifulSoup
+import json
+from urllib.parse import urljoin
+
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
 
+from src.galaxus.page_selectors import SELECTORS
 from src.model.article import Article
 from src.model.base_scraper import BaseScraper
 from src.model.brand import Brand
 from src.model.category import Category
 from src.utils.log_executor_decorator import log_execution
-from src.utils.ui_utils import UIUtils
-from selenium.webdriver.support import expected_conditions as EC
+from src.utils.metrics import METRICS
+from src.utils.ui_utils import DialogSelection
+from src.utils.wait_engine import WaitProfile
 
 
 # Scraper class for scraping articles from Galaxus website.
 class Scraper(BaseScraper):
+    _source = 'galaxus'
     _ignored_categories = ['Sale', 'Used']
     _max_pages_to_scrape = 40  # each page has 24 articles
-    _save_interval = 200  # Accumulate data into the dataframe every 100 articles
-
-    def __init__(self, base_url):
-        super().__init__(base_url)
-        self._article_data = []  # Temporary list to store article data
-        self._df = pd.DataFrame(
-            columns=["name", "price", "description", "category", "rating", "brand",
-                     "source"])
+    # keep element_timeout short, optional elements like the description toggle are missing on many articles and
+    # the scraper waits that long for each of them
+    _wait_profile = WaitProfile(element_timeout=3, quiet_period=0.4)  # galaxus renders a lot with javascript
+    _output_columns = ["name", "price", "description", "category", "rating", "brand", "source"]
+    _max_scroll_rounds = 100  # upper bound for scrolling down the listing to trigger the lazy loading of the tiles
+
+    def __init__(self, base_url, workers=1, page_cache=None, checkpoints=None, output_format='csv',
+                 category_cache=None, driver_profile=None, selection=None, max_pages=None):
+        super().__init__(base_url, workers, page_cache=page_cache, checkpoints=checkpoints,
+                         output_format=output_format, category_cache=category_cache, driver_profile=driver_profile,
+                         selection=selection or DialogSelection(category_levels=2), max_pages=max_pages)
 
     @log_execution
     def scrape(self):
-        categories = self._get_categories()
-        selected_categories = UIUtils.show_selection_window_dropdown(categories,
-                                                                     "Select the categories that you want to scrape")
-
-        for category in selected_categories:
-            for article in self._scrape_category(category):
-                # Add each article to the temporary list
-                self._article_data.append({
-                    "name": article.name,
-                    "price": article.price,
-                    "description": article.description,
-                    "category": article.category.name,
-                    "rating": article.rating,
-                    "brand": article.brand
-                })
-
-                # If we've collected 100 articles, append them to the dataframe
-                if len(self._article_data) >= self._save_interval:
-                    print("writing into df")
-                    self._df = pd.concat([self._df, pd.DataFrame(self._article_data)], ignore_index=True)
-                    self._article_data.clear()  # Clear the list after appending
-
-                # Append any remaining data to the dataframe at the end of scraping
-            if self._article_data:
-                self._df = pd.concat([self._df, pd.DataFrame(self._article_data)], ignore_index=True)
-
-                # Save the dataframe to CSV at the end
-            csv_file_path = self.save_to_csv(self._df, 'raw.csv')
-            self._df.to_csv(csv_file_path, sep='|', index=False)
-
-            self._quit_driver()
-            print("SCRAPING DONE")
-            return self._df
-
+        try:
+            categories = self._get_categories()
+            selected_categories = self._selection.select_categories(categories)
+
+            # the rows are appended to raw.csv while scraping, every self._save_interval articles
+            with self._open_sink('raw.csv', self._output_columns) as sink:
+                sink.write_many(self._resumed_rows())  # articles scraped before a crash (with --resume)
+
+                for category in selected_categories:
+                    with METRICS.span('category', category=category.name):
+                        for article in self._scrape_category(category):
+                            sink.write(self._article_row(article))
+                            METRICS.increment('articles', category=category.name)
+
+            self._waits.print_summary()
+            METRICS.print_summary()
+        finally:
+            self._quit_driver()  # also after an error, so no firefox processes are left running
+        print(f"SCRAPING DONE, {sink.rows_written} articles saved to {sink.path}")
+        return sink.path
+
+    def _article_row(self, article):
+        return {
+            "name": article.name,
+            "price": article.price,
+            "description": article.description,
+            "category": article.category.name,
+            "rating": article.rating,
+            "brand": article.brand
+        }
 
     def _get_categories(self):
+        # the sub categories of all navigation items are loaded concurrently, see _discover_categories
+        return self._discover_categories(self._get_top_categories,
+                                         lambda category, depth: self._get_subcategories(category.url), max_depth=1)
+
+    def _get_top_categories(self):
         print(f"Fetching categories from {self._base_url}")
-        soup = self._update_soup(self._base_url, sleep_timer=0.3)
+        soup = self._update_soup(self._base_url, sleep_timer=0.3, cache_state='loaded')
 
-        navigation_bar = soup.findAll('li', class_='sc-ba0f659-0')
+        navigation_bar = SELECTORS['navigation_items'].select(soup)
         print(f"Found {len(navigation_bar)} navigation items.")
 
         categories = []
@@ -78,12 +84,15 @@ class Scraper(BaseScraper):
                 href = a_tag.get('href')  # Get the 'href' attribute of the 'a' tag
                 print(f"Category found: {text}, URL: {href}")
                 if text and href and (text not in self._ignored_categories):
-                    categories.append(Category(text, href, self._get_subcategories(href)))
+                    categories.append(Category(text, href))
         return categories
 
     def _get_subcategories(self, link):
-        soup = self._update_soup(self._base_url + link)
-        list_items = soup.find('ul', class_="sc-1656bbdd-0 gQqszz").contents
+        soup = self._update_soup(self._base_url + link, cache_state='loaded')
+        return self._parse_subcategories(soup)
+
+    def _parse_subcategories(self, soup):
+        list_items = SELECTORS['sub_category_list'].select_one(soup).find_all('li', recursive=False)
         sub_categories = []
         for subcat in list_items:
             a_subcat = subcat.find('a')
@@ -94,12 +103,15 @@ class Scraper(BaseScraper):
         print(f'Getting all brands in category {category.name}')
         # self._update_soup(self._base_url + category.url, sleep_timer=0.3)
         self._wait_until_element_located(By.XPATH, "//*[@aria-label='Brand']", 'click', sleep_time=2)
-        time.sleep(1)
-        soup = BeautifulSoup(self._driver.page_source, 'html.parser')
+        self._waits.element(By.CSS_SELECTOR, SELECTORS['filter_items'].pattern, timeout=1, label='brand_filter')
+        self._waits.dom_quiet(timeout=1, label='brand_filter')
+        return self._parse_brands(self._update_soup())
+
+    def _parse_brands(self, soup):
         brands = []
-        for brand_area in soup.find('ul', class_='sc-b9093e7f-7 iiBANC').findAll('li'):
-            brand_name = brand_area.find('span', class_='sc-2b1c90df-1 kvYprx').text
-            article_count = int(brand_area.find('span', class_='sc-2b1c90df-2 dfAmFV').text)
+        for brand_area in SELECTORS['filter_list'].select_one(soup).findAll('li'):
+            brand_name = SELECTORS['filter_name'].select_one(brand_area).text
+            article_count = int(SELECTORS['filter_count'].select_one(brand_area).text)
             if article_count != 0:
                 brands.append(Brand(brand_name, article_count))
         return brands
@@ -107,54 +119,103 @@ class Scraper(BaseScraper):
     def _scrape_category(self, category):
         print(f'Scraping category {category.name}')
         sub_categories = self._get_all_sub_categories(category)
-        selected_sub_categories = UIUtils.show_selection_window(sub_categories,
-                                                                "Select the subcategories that you want to scrape")
+        selected_sub_categories = self._selection.select_sub_categories(category, sub_categories)
         self._click_on_selected_sub_categories(selected_sub_categories)
 
         brands = self._get_all_brands(category)
-        selected_brands = UIUtils.show_selection_window(brands, "Select the brands that you want to scrape")
+        selected_brands = self._selection.select_brands(category, brands)
         self._click_on_selected_brands(selected_brands)
 
         # get the p with class = 'sc-e1fe84e1-2 hZKDCk' and get the "of X" number
-        soup = BeautifulSoup(self._driver.page_source, 'html.parser')
+        soup = self._update_soup()
+        product_count = None
+        max_articles = self._max_pages_to_scrape * 24  # the listing pages of galaxus have 24 articles
         try:
-            product_count = soup.find('p', class_='sc-e1fe84e1-2 hZKDCk').text.split(" of ")[1].split()[0]  # Get the first number after 'of'
-            take_amount = 24
-            while take_amount < int(
-                    product_count):  # the page loads 24 max at first. and then increments always 60 articles
-                take_amount += 60
-            soup = self._update_soup(self._driver.current_url + f'&take={str(take_amount)}', sleep_timer=3)
+            product_count = int(SELECTORS['product_count'].select_one(soup).text.split(" of ")[1].split()[0])  # Get the first number after 'of'
+            product_count = min(product_count, max_articles)
+            soup = self._update_soup(self._driver.current_url + f'&take={self._take_amount(product_count)}',
+                                     sleep_timer=3)
         except:
             # less than 24 articles are on the page
             pass
 
-        article_list = []
         print(f'Getting all articles')
-        for article in self._driver.find_elements(By.CSS_SELECTOR, "article.sc-328a7c4f-1.dBtYoI"):
-            self._driver.execute_script("arguments[0].scrollIntoView();", article)
-            time.sleep(0.4)
-            ref = article.find_element(By.TAG_NAME, 'a').get_property('href')
-            article_list.append(ref)
-
-        article_count = 0
-        for link in article_list:
-            yield self._extract_article_data(link, category)
-            article_count +=1
-            if article_count % 300 == 0:
-                self._release_memory()
+        # all links are read from a single parse of the page. only if tiles are missing (lazy loading), the page is
+        # scrolled down once and parsed again
+        article_list = self._harvest_article_links(soup)
+        if product_count is None or len(article_list) < product_count:
+            self._scroll_to_bottom()
+            article_list = self._harvest_article_links(self._update_soup())
+        article_list = article_list[:max_articles]
+
+        yield from self._extract_articles(lambda link: self._extract_article_data(link, category), article_list,
+                                          category.url)
+
+    @staticmethod
+    def _take_amount(product_count):
+        # the page loads 24 max at first. and then increments always 60 articles
+        take_amount = 24
+        while take_amount < product_count:
+            take_amount += 60
+        return take_amount
+
+    def _harvest_article_links(self, soup):
+        """
+        :return: The absolute links of all articles in the listing, from the structured data the page embeds and
+        from the article tiles (the structured data may only list a part of the loaded tiles), without duplicates.
+        """
+        links = self._structured_data_links(soup)
+        for tile in SELECTORS['article_tiles'].select(soup):
+            link = SELECTORS['article_tile_link'].select_one(tile)
+            if link is not None:
+                links.append(link.get('href'))
+        return list(dict.fromkeys(urljoin(self._base_url, link) for link in links))
+
+    def _structured_data_links(self, soup):
+        # product urls of the ItemList in the json-ld of the page (schema.org), if there is one
+        links = []
+        for script in SELECTORS['structured_data'].select(soup):
+            try:
+                data = json.loads(script.string or '')
+            except ValueError:
+                continue
+            for item in data if isinstance(data, list) else [data]:
+                if isinstance(item, dict) and item.get('@type') == 'ItemList':
+                    elements = item.get('itemListElement') or []
+                    for element in elements if isinstance(elements, list) else [elements]:
+                        # an element is the url itself, a ListItem with a url or a ListItem whose item is the
+                        # url or the product with its url
+                        if isinstance(element, dict):
+                            element = element.get('url') or element.get('item')
+                        if isinstance(element, dict):
+                            element = element.get('url')
+                        if isinstance(element, str) and element:
+                            links.append(element)
+        return links
+
+    def _scroll_to_bottom(self):
+        # scrolls down one screen at a time until the end of the page, so the lazy loaded tiles are rendered
+        for _ in range(self._max_scroll_rounds):
+            at_bottom = self._driver.execute_script(
+                "window.scrollBy(0, window.innerHeight);"
+                "return window.innerHeight + window.scrollY >= document.body.scrollHeight;")
+            self._waits.dom_quiet(timeout=0.4, label='scroll_listing')
+            if at_bottom:
+                break
 
     # todo can be refactored
     def _get_all_sub_categories(self, category):
         print(f'Getting all sub categories from {category.name}')
         self._update_soup(self._base_url + category.url, sleep_timer=0.3)
         self._wait_until_element_located(By.XPATH, "//*[@aria-label='Category']", 'click', sleep_time=2)
-        time.sleep(1)
-        soup = BeautifulSoup(self._driver.page_source, 'html.parser')
+        self._waits.element(By.CSS_SELECTOR, SELECTORS['filter_items'].pattern, timeout=1, label='category_filter')
+        self._waits.dom_quiet(timeout=1, label='category_filter')
+        soup = self._update_soup()
 
         sub_categories = []
-        for category_area in soup.find('ul', class_='sc-b9093e7f-7 iiBANC').findAll('li'):
-            article_count = int(category_area.find('span', class_='sc-2b1c90df-2 dfAmFV').text)
-            category_name = category_area.find('span', class_='sc-2b1c90df-1 kvYprx').text
+        for category_area in SELECTORS['filter_list'].select_one(soup).findAll('li'):
+            article_count = int(SELECTORS['filter_count'].select_one(category_area).text)
+            category_name = SELECTORS['filter_name'].select_one(category_area).text
             if article_count != 0:
                 sub_categories.append(Category(category_name, article_count))
         return sub_categories
@@ -162,16 +223,17 @@ class Scraper(BaseScraper):
     def _click_on_selected_brands(self, brands):
         for brand in brands:
             # selects all brands by clicking on the "checkbox" (due to brand encoding for url)
-            span_with_brand_name = WebDriverWait(self._driver, 10).until(EC.presence_of_element_located(
-                (By.XPATH, f"//div[@id='bra']//span[@class='sc-2b1c90df-1 kvYprx' and text()='{brand.name}']")))
+            span_with_brand_name = self._waits.element(
+                By.XPATH, f"//div[@id='bra']//span[@class='sc-2b1c90df-1 kvYprx' and text()='{brand.name}']",
+                timeout=10, label='brand_checkbox')
 
             parent = span_with_brand_name.find_element(By.XPATH, "./..")
             checkbox_span = parent.find_element(By.XPATH, "./span[1]")
             self._driver.execute_script("arguments[0].scrollIntoView();", checkbox_span)
-            time.sleep(0.1)
+            self._waits.dom_quiet(timeout=0.1, label='scroll')
             self._driver.execute_script("window.scrollBy(0, -150);")
             checkbox_span.click()
-            time.sleep(0.8)
+            self._waits.dom_quiet(timeout=0.8, label='brand_checkbox')
 
         apply_brands_button = self._driver.find_element(By.CSS_SELECTOR,
                                                         "button.sc-162db2fb-0.myuCZ.sc-162db2fb-1.sc-7707229f-2.kRbzeV.eCnljM")
@@ -180,16 +242,17 @@ class Scraper(BaseScraper):
     def _click_on_selected_sub_categories(self, selected_sub_categories):
         for sub_category in selected_sub_categories:
             # selects all brands by clicking on the "checkbox" (due to sub_category encoding for url)
-            span_with_brand_name = WebDriverWait(self._driver, 10).until(EC.presence_of_element_located(
-                (By.XPATH, f"//div[@id='pt']//span[@class='sc-2b1c90df-1 kvYprx' and text()='{sub_category.name}']")))
+            span_with_brand_name = self._waits.element(
+                By.XPATH, f"//div[@id='pt']//span[@class='sc-2b1c90df-1 kvYprx' and text()='{sub_category.name}']",
+                timeout=10, label='sub_category_checkbox')
 
             parent = span_with_brand_name.find_element(By.XPATH, "./..")
             checkbox_span = parent.find_element(By.XPATH, "./span[1]")
             self._driver.execute_script("arguments[0].scrollIntoView();", checkbox_span)
-            time.sleep(0.1)
+            self._waits.dom_quiet(timeout=0.1, label='scroll')
             self._driver.execute_script("window.scrollBy(0, -150);")
             checkbox_span.click()
-            time.sleep(0.1)
+            self._waits.dom_quiet(timeout=0.1, label='sub_category_checkbox')
 
         apply_brands_button = self._driver.find_element(By.CSS_SELECTOR,
                                                         "button.sc-162db2fb-0.myuCZ.sc-162db2fb-1.sc-7707229f-2.kRbzeV.eCnljM")
@@ -197,7 +260,14 @@ class Scraper(BaseScraper):
         pass
 
     def _extract_article_data(self, link, category):
-        soup = self._update_soup(link)
+        soup = self._cached_soup(link, 'details')
+        if soup is None:
+            soup = self._load_article_details(link)
+        return self._parse_article(soup, category)
+
+    # opens the specifications and the full description of the article and returns the resulting page
+    def _load_article_details(self, link):
+        self._get_page(link)
 
         try:
             self._driver.execute_script("arguments[0].scrollIntoView();",
@@ -206,54 +276,63 @@ class Scraper(BaseScraper):
         except Exception as e:
             print("not scrollable into",e)
 
-        time.sleep(2)
-
         try:
 
             # specifications = self._driver.find_elements(By.ID, 'specifications')[0].click()
 
-            show_more = self._driver.find_element(By.CSS_SELECTOR, "button[data-test='showMoreButton-specifications']")
+            # the specifications are rendered lazily once they are scrolled into view
+            show_more = self._waits.element(By.CSS_SELECTOR, SELECTORS['show_more_specifications'].pattern,
+                                            timeout=2, label='specifications')
             self._driver.execute_script("arguments[0].scrollIntoView();", show_more)
 
-            time.sleep(0.4)
+            self._waits.dom_quiet(timeout=0.4, label='scroll')
             self._driver.execute_script("window.scrollBy(0, -350);")
-            time.sleep(0.5)
+            self._waits.element(By.CSS_SELECTOR, SELECTORS['show_more_specifications'].pattern, 'clickable',
+                                timeout=0.5, label='specifications')
             show_more.click()
             # self._driver.execute_script("arguments[0].scrollIntoView();", specifications)
             # time.sleep(1)
             # self._driver.execute_script("window.scrollBy(0, 100);")
             # self._wait_until_element_located(By.CSS_SELECTOR, "button[data-test='showMoreButton-specifications']", 'click', sleep_time=1)
-            soup = self._update_soup()
-            time.sleep(0.2)
-            specs = soup.findAll('a', class_='sc-972af934-0 hoQmUQ')
-            if len(specs) > 0:
-                brand = specs[0].text.replace("\n", " ").strip()  # Make sure to use strip to remove extra spaces
-            else:
-                brand = None
-
-            if len(specs) > 1:
-                found_category = specs[1].text.replace("\n", " ").strip()
-            else:
-                found_category = category  # Use the default category if not found
+            self._waits.element(By.CSS_SELECTOR, SELECTORS['specifications'].pattern, timeout=1, label='specifications')
         except Exception as e:
-            brand = None
-            found_category = category
-
-
-        article_name = soup.find('h1').text
-        price = float(soup.find('button', class_='sc-d8df8e48-5 ccjwlK').text.replace(".–", '').replace("’", "").replace(
-            'CHF', ''))
+            print("specifications could not be opened", e)
 
         try:
-            self._wait_until_element_located(By.CSS_SELECTOR, "button[data-test='ShowMoreToggleButton-description']",'click')
+            self._wait_until_element_located(By.CSS_SELECTOR, SELECTORS['show_more_description'].pattern, 'click')
         except Exception as e:
             # description is already complete
             pass
 
-        soup = self._update_soup()
-        description = soup.find('div', class_='sc-5a972e05-0 jzGCwC').text.replace("\n", " ")
+        # the specifications and the description are both opened now
+        return self._update_soup(cache_state='details')
+
+    def _parse_article(self, soup, category):
+        brand, found_category = self._parse_specifications(soup, category)
+        article_name = SELECTORS['article_name'].select_one(soup).text
+        price = float(SELECTORS['price'].select_one(soup).text.replace(".–", '').replace("’", "").replace('CHF', ''))
+
+        description = SELECTORS['description'].select_one(soup).text.replace("\n", " ")
+        rating = self._parse_rating(soup)
+        return Article(article_name, price, description, Category(found_category, None, None), rating, brand)
+
+    def _parse_specifications(self, soup, category):
+        # the first two specifications are the brand and the exact category of the article
+        specs = SELECTORS['specifications'].select(soup)
+        if len(specs) > 0:
+            brand = specs[0].text.replace("\n", " ").strip()  # Make sure to use strip to remove extra spaces
+        else:
+            brand = None
+
+        if len(specs) > 1:
+            found_category = specs[1].text.replace("\n", " ").strip()
+        else:
+            found_category = category  # Use the default category if not found
+        return brand, found_category
+
+    def _parse_rating(self, soup):
         try:
-             rating = float(soup.find('div', class_='sc-98a81fa6-0 UIRot').find('span', class_='sc-218358ee-2 sc-218358ee-3 jltNFx bFfwDd star_stars__LYfBH sc-d9dbbd3c-1 jsBVEW').get('aria-label').split(" out")[0])
+            rating_area = SELECTORS['rating_area'].select_one(soup)
+            return float(SELECTORS['rating_stars'].select_one(rating_area).get('aria-label').split(" out")[0])
         except Exception as e:
-            rating = None
-        return Article(article_name, price, description, Category(found_category, None, None), rating, brand)
+            return None
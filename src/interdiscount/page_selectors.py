@@ -0,0 +1,26 @@
+from src.utils.html_parser import compile_selectors
+
+# All CSS selectors of the interdiscount pages, compiled once
+SELECTORS = compile_selectors({
+    # home and category pages
+    'navigation': 'nav',
+    'sub_category_navigation': 'nav > ul',
+    'sub_category_links': 'li > a',
+    # brand filter of a category
+    'brand_filter': 'fieldset',
+    # listing pages
+    'listing': 'ul[data-testid="category-wrapper"]',
+    'listing_links': 'li > article > a',
+    'next_page': 'a:-soup-contains("Weiter")',
+    'pagination_links': 'a[href*="page="]',
+    # product pages
+    'article_name': 'h1',
+    'price': 'span[data-testid="product-price"]',
+    'description': 'div[data-testid="text-clamp"]',
+    'breadcrumb': 'nav ol > li',
+    'review_controls': '#collapsible-reviews-controls',
+    'review_score': 'div.mr-4',
+})
+
+# fields that must be in the static html of a product page, otherwise it is loaded in the browser
+REQUIRED_ARTICLE_FIELDS = [SELECTORS[name] for name in ('article_name', 'price', 'description', 'breadcrumb')]
@@ -3,34 +3,82 @@ import datetime
 import pandas as pd
 import re
 import spacy
-from deep_translator import GoogleTranslator
 
 from src.model.base_preprocessor import BasePreProcessor
+from src.utils.batch_translator import BatchTranslator
 from src.utils.log_executor_decorator import log_execution
+from src.utils.metrics import METRICS
+from src.utils.translation_cache import TranslationCache
+from src.utils.translator_backend import GoogleTranslatorBackend
 
 
 class PreProcessor(BasePreProcessor):
-    def __init__(self, file_path):
-        super().__init__(file_path)
-        # Initialize the translator
-        self._translator = GoogleTranslator(source='de', target='en')
-        # Load the spaCy NLP model for NER (Named Entity Recognition)
-        self._nlp = spacy.load("en_core_web_sm")
+    _translated_columns = ['name', 'description', 'category', 'sub_category']
+    _ner_batch_size = 256
+
+    def __init__(self, file_path, output_format='csv', translator=None, translation_cache=None, translation_workers=4,
+                 ner_processes=1, column_mode=True, chunk_size=None, resume=False, processes=1, brand_index=None):
+        """
+        :param translator: TranslatorBackend, google translate from german to english by default.
+        :param translation_cache: TranslationCache, data/translation_cache.sqlite by default.
+        :param translation_workers: Number of translation requests that run at the same time.
+        :param ner_processes: Number of processes that run the named entity recognition.
+        :param column_mode: Process whole columns at once instead of row by row.
+        :param chunk_size: Stream the file in chunks of this many rows (see BasePreProcessor._process_chunks).
+        :param resume: Continue the streaming after the last chunk that was finished by the previous run.
+        :param processes: Number of processes that preprocess shards of the dataset in parallel.
+        :param brand_index: BrandIndex of the known brands (e.g. from brands.csv), looked up before the NER is used.
+        """
+        super().__init__(file_path, output_format=output_format, chunk_size=chunk_size, resume=resume,
+                         processes=processes)
+        # Every distinct text is only translated once, across rows, runs and processes
+        self._translation_cache = translation_cache if translation_cache is not None else TranslationCache()
+        self._translator_backend = translator if translator is not None else GoogleTranslatorBackend('de', 'en')
+        self._translation_workers = translation_workers
+        self._translator = BatchTranslator(self._translator_backend, self._translation_cache,
+                                           max_workers=translation_workers)
+        self._brand_index = brand_index
+        self._ner_processes = ner_processes
+        self._column_mode = column_mode
+        self._spacy_model = None
+        self._recognized_brands = {}  # brand candidate -> brand found by NER (or None)
+
+    # The worker processes get the same settings, each processes whole shards on its own (so no nested NER processes)
+    def _worker_kwargs(self):
+        return {
+            'output_format': self._output_format,
+            'translator': self._translator_backend,
+            'translation_cache': self._translation_cache,
+            'translation_workers': self._translation_workers,
+            'column_mode': self._column_mode,
+            'brand_index': self._brand_index
+        }
+
+    # The spaCy model is loaded once when a worker process starts, not per shard
+    def _prepare_worker(self):
+        self._nlp
+
+    # The spaCy NLP model for NER (Named Entity Recognition) is only loaded once it is needed
+    @property
+    def _nlp(self):
+        if self._spacy_model is None:
+            self._spacy_model = spacy.load("en_core_web_sm")
+        return self._spacy_model
 
     # Private function to extract the brand. For most cases, brands were somewhat easily extracted.
     # For the other cases, NLP is used to extract the brand
     def _extract_brand(self, name, brand):
         if brand == '':
+            # Brands that the scraper already collected are found in the brand index, without NER
+            indexed_brand = self._index_brand(name)
+            if indexed_brand:
+                brand, length = indexed_brand
+                return brand, name[length:].strip()
 
             possible_brand = self._extract_uppercase_words(name)
-            doc = self._nlp(possible_brand)
-            brand = None
-
-            # Loop through entities identified by NER
-            for ent in doc.ents:
-                if ent.label_ == "ORG":  # 'ORG' label typically refers to organizations/brands
-                    brand = ent.text
-                    break
+            if possible_brand not in self._recognized_brands:
+                self._recognize_brands([possible_brand])
+            brand = self._recognized_brands[possible_brand]
 
             # If no brand is detected, fall back to a simple heuristic
             if not brand:
@@ -38,6 +86,24 @@ class PreProcessor(BasePreProcessor):
 
         return brand, name[len(brand):].strip()
 
+    # Private function to look up the brand the name starts with, returns the brand and its length in the name or None
+    def _index_brand(self, name):
+        return self._brand_index.match(name) if self._brand_index is not None else None
+
+    # Private function to run the NER on all distinct brand candidates at once, the results are memoized
+    def _recognize_brands(self, candidates):
+        candidates = [candidate for candidate in dict.fromkeys(candidates) if candidate not in self._recognized_brands]
+        if not candidates:
+            return
+
+        # only the NER component is needed, the tagger, parser, lemmatizer etc. are skipped
+        METRICS.increment('ner_candidates', len(candidates))
+        with METRICS.span('ner'), self._nlp.select_pipes(enable='ner'):
+            docs = self._nlp.pipe(candidates, batch_size=self._ner_batch_size, n_process=self._ner_processes)
+            for candidate, doc in zip(candidates, docs):
+                # 'ORG' label typically refers to organizations/brands
+                self._recognized_brands[candidate] = next((ent.text for ent in doc.ents if ent.label_ == "ORG"), None)
+
 
     def _extract_uppercase_words(self, name):
         # Match all uppercase words until the first lowercase or mixed-case word is found
@@ -53,26 +119,13 @@ class PreProcessor(BasePreProcessor):
             return ''
         return re.sub(r'^[^a-zA-Z0-9]+', '', text)
 
-    # Private function to translate text from German to English (very time-consuming!)
-    def _translate_text(self, text):
-        # Define the character limit as we cannot translate more than 5k chars at once
-        max_chars = 5000
+    # Column-wise version of _clean_text, values that are not strings become ''
+    def _clean_column(self, column):
+        return column.astype(object).str.replace(r'^[^a-zA-Z0-9]+', '', regex=True).fillna('')
 
-        # Convert the text to a string if it isn't one already
-        if not isinstance(text, str):
-            return ''
-
-        # If the text is within the character limit, translate directly
-        if len(text) <= max_chars:
-            return self._translator.translate(text)
-
-        # Otherwise, split the text into chunks and translate each chunk
-        translated_text = ""
-        for i in range(0, len(text), max_chars):
-            chunk = text[i:i + max_chars]
-            translated_text += self._translator.translate(chunk) + " "
-
-        return translated_text.strip()
+    # Column-wise version of _extract_uppercase_words
+    def _extract_uppercase_column(self, names):
+        return names.str.extract(r'^([A-Z\s\W]+)(?=\b[a-zA-Z])', expand=False).fillna('').str.strip()
 
     # Private function to process each row
     def _process_row(self, row):
@@ -81,48 +134,89 @@ class PreProcessor(BasePreProcessor):
         description = self._clean_text(row['description'])
 
         brand = self._clean_text(row['brand'])
-        category = row['category']
-        sub_category = row['sub_category']
 
         # Extract the brand and update the name accordingly
         brand, name = self._extract_brand(cleaned_name, brand)
 
-
-        # Translate name, description and category (again: time-consuming)
-        translated_name = self._translate_text(name)
-        translated_description = self._translate_text(description)
-        tranlsated_category = self._translate_text(category)
-        tranlsated_sub_category = self._translate_text(category)
-
-        # Return processed data
+        # Return processed data, the texts are translated for all rows at once in process()
         return pd.Series({
             'brand': brand,
-            'name': translated_name,
-            'description': translated_description,
-            'category': tranlsated_category,
-            'sub_category': tranlsated_sub_category,
-            'source': "interdiscount"
+            'name': name,
+            'description': description
         })
 
-    # Public method to process the entire dataset
-    @log_execution
-    def process(self):
-        start = datetime.datetime.now()
-        total_rows = len(self.df)
+    # Private function to process the whole DataFrame row by row (the original, slow implementation)
+    def _process_rows(self, df):
+        total_rows = len(df)
         progress_interval = total_rows // 100 if total_rows >= 100 else 1  # Determine when to update the progress
 
+        # Recognize the brands of all rows without a brand in batches, before the rows are processed one by one
+        self._recognize_brands(self._extract_uppercase_words(self._clean_text(name))
+                               for name, brand in zip(df['name'], df['brand'])
+                               if self._clean_text(brand) == '' and self._index_brand(self._clean_text(name)) is None)
+
         # Apply the processing to each row of the DataFrame
-        for idx, row in self.df.iterrows():
-            self.df.loc[idx, ['brand', 'name', 'description', 'category', 'sub_category', 'source']] = self._process_row(row)
+        for position, (idx, row) in enumerate(df.iterrows()):
+            df.loc[idx, ['brand', 'name', 'description']] = self._process_row(row)
 
-            # Show progress for every 1% of the total rows
-            if idx % progress_interval == 0:
-                percentage = (idx / total_rows) * 100
+            # Show progress for every 1% of the total rows (of the chunk in the streaming mode)
+            if position % progress_interval == 0:
+                percentage = (position / total_rows) * 100
                 print(f"Progress: {percentage:.2f}%")
+        return df
+
+    # Private function to process the whole DataFrame with column-wise string operations, same result as _process_rows
+    def _process_columns(self, df):
+        names = self._clean_column(df['name'])
+        brands = self._clean_column(df['brand'])
+
+        # brands of the rows without one: a known brand from the brand index, otherwise the uppercase words at the
+        # start of the name or the brand NER finds in them
+        missing_brand = brands == ''
+        indexed = pd.Series([self._index_brand(name) for name in names[missing_brand]],
+                            index=names.index[missing_brand], dtype=object).dropna()
+        missing_brand[indexed.index] = False
+        candidates = self._extract_uppercase_column(names[missing_brand])
+        self._recognize_brands(candidates.unique())
+        recognized = candidates.map(self._recognized_brands)
+        brands[missing_brand] = recognized.where(recognized.notna() & (recognized != ''), candidates)
+        # strip the brand from the start of the name, one slice per distinct brand length
+        brand_lengths = brands.str.len()
+        if not indexed.empty:  # e.g. without a brand index
+            brands[indexed.index] = indexed.str[0]
+            brand_lengths[indexed.index] = indexed.str[1].astype(int)
+        for length in brand_lengths.unique():
+            rows = brand_lengths == length
+            names[rows] = names[rows].str.slice(int(length)).str.strip()
+
+        df['brand'] = brands
+        df['name'] = names
+        df['description'] = self._clean_column(df['description'])
+        return df
+
+    # Private function to process a DataFrame, the whole dataset or a chunk of it in the streaming mode
+    def _process_frame(self, df):
+        if self._column_mode:
+            df = self._process_columns(df)
+        else:
+            df = self._process_rows(df)
+
+        # Translate the distinct texts of all rows in batches (again: time-consuming)
+        for column, translated in self._translator.translate_columns(df, self._translated_columns).items():
+            df[column] = translated
+        df['source'] = "interdiscount"
+        return df
+
+    # Public method to process the entire dataset
+    @log_execution
+    def process(self):
+        start = datetime.datetime.now()
 
-        # Save the processed file
-        self.df.to_csv("data/preprocessed.csv", index=False, sep='|')
+        # Process the dataset and save the processed file
+        path = self._process_and_save('preprocessed')
+        self._translation_cache.close()
 
         # Time tracking
         after = datetime.datetime.now()
         print(f"Started: {start}, Ended: {after}, Duration: {after - start}")
+        return path
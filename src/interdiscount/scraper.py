@@ -1,136 +1,147 @@
 import re
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import pandas as pd
-import unicodedata
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 
 from src.interdiscount.model.interdiscount_article import InterdiscountArticle
+from src.interdiscount.page_selectors import REQUIRED_ARTICLE_FIELDS, SELECTORS
 from src.model.base_scraper import BaseScraper
 from src.model.brand import Brand
+from src.model.brand_index import BrandIndex
 from src.model.category import Category
+from src.utils.html_parser import parse_html
 from src.utils.log_executor_decorator import log_execution
-from src.utils.ui_utils import UIUtils
+from src.utils.metrics import METRICS
+from src.utils.page_cache import PageCacheMiss
+from src.utils.ui_utils import DialogSelection, UIUtils
+from src.utils.wait_engine import WaitProfile
 
 CATEGORIES_TO_SCRAPE = ['TV & Audio', 'Computer & Gaming']
 
 
 # Scraper class for scraping articles from Interdiscount website.
 class Scraper(BaseScraper):
+    _source = 'interdiscount'
     _max_pages_to_scrape = 40  # each page has 24 articles
-    _save_interval = 200  # Accumulate data into the dataframe every 100 articles
-
-    def __init__(self, base_url):
-        super().__init__(base_url)
-        self._interactive_mode = UIUtils.ask_interactive_mode() == 'yes'
-        self._article_data = []  # Temporary list to store article data
-        self._brands_df = pd.DataFrame(
-            columns=["category", "brand_name", "article_count"]
-        )
-        self._article_df = pd.DataFrame(
-            columns=["name", "price", "description", "category", "rating", "brand", "sub_category"])
+    _wait_profile = WaitProfile(element_timeout=3, quiet_period=0.2)
+    _use_http_fast_path = True  # product pages are rendered on the server
+    _async_prefetch = 48  # product pages that are fetched ahead of the parsing in async mode (two listing pages)
+    _listing_workers = 6  # listing pages that are fetched at the same time over HTTP
+    _output_columns = ["name", "price", "description", "category", "rating", "brand", "sub_category"]
+    _brand_columns = ["category", "brand_name", "article_count"]
+
+    def __init__(self, base_url, workers=1, async_fetch=False, page_cache=None, checkpoints=None,
+                 output_format='csv', category_cache=None, driver_profile=None, selection=None, max_pages=None,
+                 interactive_mode=None, top_categories=None):
+        # without a selection (e.g. a JobSpec), the categories and brands are picked in dialogs in interactive mode
+        if selection is None:
+            if interactive_mode is None:
+                interactive_mode = UIUtils.ask_interactive_mode() == 'yes'
+            selection = DialogSelection(category_levels=3) if interactive_mode else None
+        super().__init__(base_url, workers, async_fetch=async_fetch, page_cache=page_cache, checkpoints=checkpoints,
+                         output_format=output_format, category_cache=category_cache, driver_profile=driver_profile,
+                         selection=selection, max_pages=max_pages)
+        self._top_categories = top_categories or CATEGORIES_TO_SCRAPE
+        self._cookie_banner_closed = False
+        self._brands_sink = None
 
     def scrape(self):
-        print(f"Fetching categories from {self._base_url}")
-        categories = self._get_categories()
-        if self._interactive_mode:
-            categories = UIUtils.show_selection_window_dropdown_3_levels(categories,
-                                                                         "Select the categories that you want to scrape")
-
-        self._close_cookie_banner()
-
-        # Iterate over selected categories and scrape articles
-        for category in categories:
-            if category.url:
-                for article in self._scrape_category(category):
-                    # Add each article to the temporary list
-                    self._article_data.append({
-                        "name": article.name,
-                        "price": article.price,
-                        "description": article.description,
-                        "category": article.category.name,
-                        "rating": article.rating,
-                        "brand": article.brand,
-                        "sub_category": article.sub_category
-                    })
-
-                    # If we've collected 100 articles, append them to the dataframe
-                    if len(self._article_data) >= self._save_interval:
-                        print("writing into df")
-                        self._article_df = pd.concat([self._article_df, pd.DataFrame(self._article_data)],
-                                                     ignore_index=True)
-                        self._article_data.clear()  # Clear the list after appending
-
-        # Append any remaining data to the dataframe at the end of scraping
-        if self._article_data:
-            self._article_df = pd.concat([self._article_df, pd.DataFrame(self._article_data)], ignore_index=True)
-
-        # Save the dataframe to CSV at the end
-        csv_file_path = self.save_to_csv(self._article_df, 'raw.csv')
-        self._article_df.to_csv(csv_file_path, sep='|', index=False)
-
-        self._quit_driver()
-        print("SCRAPING DONE")
-        return self._article_df
+        try:
+            print(f"Fetching categories from {self._base_url}")
+            categories = self._get_categories()
+            if self._selection is not None:
+                categories = self._selection.select_categories(categories)
+
+            # the rows are appended to raw.csv while scraping, every self._save_interval articles
+            with self._open_sink('raw.csv', self._output_columns) as sink, \
+                    self._open_sink('brands.csv', self._brand_columns, separator=',') as self._brands_sink:
+                sink.write_many(self._resumed_rows())  # articles scraped before a crash (with --resume)
+
+                # Iterate over selected categories and scrape articles
+                for category in categories:
+                    if category.url:
+                        with METRICS.span('category', category=category.name):
+                            for article in self._scrape_category(category):
+                                sink.write(self._article_row(article))
+                                METRICS.increment('articles', category=category.name)
+
+            self._waits.print_summary()
+            self._print_fetch_summary()
+            METRICS.print_summary()
+        finally:
+            self._quit_driver()  # also after an error, so no firefox processes are left running
+        print(f"SCRAPING DONE, {sink.rows_written} articles saved to {sink.path}")
+        return sink.path
+
+    def _article_row(self, article):
+        return {
+            "name": article.name,
+            "price": article.price,
+            "description": article.description,
+            "category": article.category.name,
+            "rating": article.rating,
+            "brand": article.brand,
+            "sub_category": article.sub_category
+        }
 
     @log_execution
     def _get_categories(self):
-        soup = self._update_soup(self._base_url)
-        navigation_bar = soup.findAll('nav')
+        # we just want to go two levels further down. if you're brave enough, increase max_depth and you can wait 30+ minutes to go through all categories and its sub-sub-sub....categories ;-)
+        # the tree depends on the top categories, a tree cached for other top categories is discovered again
+        return self._discover_categories(self._get_top_categories, self._get_sub_categories, max_depth=2,
+                                         cache_key=sorted(self._top_categories))
+
+    def _get_top_categories(self):
+        soup = self._update_soup(self._base_url, cache_state='loaded')
+        navigation_bar = SELECTORS['navigation'].select(soup)
         ul = navigation_bar[2].find('ul')
         categories = []
         for li in ul.find_all('li'):
             category_name = li.get_text(strip=True)
             # if category_name in ['Übersicht', 'Prospekt']:  # has no articles. hence, we ignore them. if you want to scrape everything except those.
-            if category_name not in CATEGORIES_TO_SCRAPE:  # if you only want to check the headphones example, comment the upper if statement out and comment this one (for time-reasons)
+            if category_name not in self._top_categories:  # if you only want to check the headphones example, comment the upper if statement out and comment this one (for time-reasons)
                 continue
             category_url = li.find('a').get('href') if li.find('a') else None
-
-            # we just want to go two levels further down. if you're brave enough, do the recursion and you can wait 30+ minutes to go through all categories and its sub-sub-sub....categories ;-)
-            sub_cats = self._get_sub_categories(category_url)
-            categories.append(Category(category_name, category_url, sub_cats))
+            categories.append(Category(category_name, category_url))
         return categories
 
     @log_execution
     def _scrape_category(self, category):
-        self._driver.get(self._base_url + category.url + '?page=1')
+        self._get_page(self._base_url + category.url + '?page=1')
+        if not self._cookie_banner_closed:
+            # closed on the first category page, the home page might have been served from the page cache
+            self._close_cookie_banner()
+            self._cookie_banner_closed = True
         all_brands = self._get_all_brands()
 
-        selected_brands = UIUtils.show_selection_window(all_brands, "Select the brands that you want to scrape") \
-            if self._interactive_mode else []
+        selected_brands = self._selection.select_brands(category, all_brands) if self._selection is not None else []
 
         self._click_on_selected_brands(selected_brands)
-        # add all brands to dataframe: self._brands_df.
-        self._update_brands_df(category.name, all_brands)
-
-        article_count = 0
-        for article_link in self._extract_all_product_links_in_category():
+        brand_index = BrandIndex(selected_brands)
+        # add all brands to brands.csv
+        self._save_brands(category.name, all_brands)
+
+        # the article details are extracted by self._workers drivers (or from the pages prefetched by the async
+        # fetcher). the drivers are recycled by the driver pool, in case you want to scrape the entire interdiscount,
+        # we make sure your application does not crash due to memory issues.
+        yield from self._extract_articles(
+            lambda article_link, html=None: self._extract_data(article_link, category,
+                                                               self._get_brand(article_link, brand_index), html),
+            self._extract_all_product_links_in_category(category.url),
+            category.url)
+
+    def _save_brands(self, category_name, brands):
+        """Append the brand names and article counts of the category to brands.csv."""
 
-            yield self._extract_data(article_link, category, self._get_brand(article_link, selected_brands))
-            article_count += 1
-            if article_count % 300 == 0:  # in case you want to scrape the entire interdiscount, we make sure your application does not crash due to memory issues.
-                self._release_memory()
-
-    def _update_brands_df(self, category_name, brands):
-        """Update the brands DataFrame with the latest brand names and article counts."""
-
-        # Create a list of dictionaries for each brand's name and article count
-        brand_data = [
-            {
+        for brand in brands:
+            self._brands_sink.write({
                 "category": category_name,  # The chosen category
-                "brand_name": brand.name,  # Use brand.name attribute
-                "article_count": brand.article_count  # Use brand.article_count attribute
-            }
-            for brand in brands  # Loop through the brands array
-        ]
+                "brand_name": brand.name,
+                "article_count": brand.article_count
+            })
 
-        # Append the data to the DataFrame
-        self._brands_df = pd.concat([self._brands_df, pd.DataFrame(brand_data)], ignore_index=True)
-
-        # Write the DataFrame to a CSV file after processing each category
-        self._brands_df.to_csv("data\\brands.csv", index=False)
+        # Write the brands to the CSV file after processing each category
+        self._brands_sink.flush()
 
         print(f"Data for {category_name} saved to brands.csv")
 
@@ -138,8 +149,10 @@ class Scraper(BaseScraper):
     def _get_all_brands(self):
         self._wait_until_element_located(By.XPATH, "//button[.//span[text()='Marken']]",
                                          'click')  # Open brands dropdown
-        soup = self._update_soup(sleep_timer=0.2)
-        all_brands_list = soup.findAll("fieldset")[0].contents[2]
+        return self._parse_brands(self._update_soup(sleep_timer=0.2))
+
+    def _parse_brands(self, soup):
+        all_brands_list = SELECTORS['brand_filter'].select_one(soup).contents[2]
 
         brands = []
         for brand_element in all_brands_list.findAll('div')[::3]:  # we have always 3 divs per entry
@@ -158,25 +171,43 @@ class Scraper(BaseScraper):
         except Exception:
             print("Cookie banner not found")
 
-    def _extract_data(self, article_link, category, brand):
-        soup = self._update_soup(self._base_url + article_link)
+    def _extract_data(self, article_link, category, brand, html=None):
+        url = self._base_url + article_link
+        soup, from_browser = self._fetch_soup(url, REQUIRED_ARTICLE_FIELDS, html)
 
         price = self._get_price(soup)
-        name = soup.find('h1').contents[0].text.strip('"')
+        name = SELECTORS['article_name'].select_one(soup).contents[0].text.strip('"')
         description = self._get_description(soup)
-        rating = self._get_rating()
-        exact_category = soup.select('nav ol > li')[-2].text
+        review_controls = SELECTORS['review_controls'].select_one(soup)
+        if not from_browser and review_controls is not None and review_controls.text.strip():
+            rating = self._parse_rating(review_controls)  # reviews are already in the static html
+        else:
+            rating = self._get_rating_of_page(url, from_browser)
+        exact_category = SELECTORS['breadcrumb'].select(soup)[-2].text
         return InterdiscountArticle(name, price, description, category, rating, brand, exact_category)
 
     def _get_price(self, soup):
-        price = soup.find('span', attrs={'data-testid': 'product-price'})
+        price = SELECTORS['price'].select_one(soup)
         return float(price.contents[0].text.replace(".–", '').replace("’", ""))
 
     def _get_description(self, soup):
-        self._wait_until_element_located(By.ID, "collapsible-description", 'click')
-        description = soup.find('div', attrs={'data-testid': 'text-clamp'}).contents[0].text.replace("\n", " ")
+        description = SELECTORS['description'].select_one(soup).contents[0].text.replace("\n", " ")
         return description.strip('"') if description else None
 
+    def _get_rating_of_page(self, url, from_browser):
+        try:
+            reviews_soup = self._cached_soup(url, 'reviews')
+        except PageCacheMiss:
+            return None  # in replay, reviews that were never opened do not exist (e.g. articles to be reserved)
+        if reviews_soup is not None:
+            return self._parse_rating(SELECTORS['review_controls'].select_one(reviews_soup))
+
+        if not from_browser:
+            # the reviews are only loaded after clicking on collapsible-reviews
+            self._count_fetch('browser (ratings)')
+            self._get_page(url)
+        return self._get_rating()
+
     def _get_rating(self):
 
         if not self._wait_until_element_located(By.XPATH, "//button[text()='Bewertungen']"):
@@ -186,9 +217,11 @@ class Scraper(BaseScraper):
         except Exception as e:
             print("collapsible reviews does not exist")
 
+        soup = self._update_soup(sleep_timer=0.3, cache_state='reviews')
+        return self._parse_rating(SELECTORS['review_controls'].select_one(soup))
+
+    def _parse_rating(self, review_controls):
         try:
-            soup = self._update_soup(sleep_timer=0.3)
-            review_controls = soup.find(id='collapsible-reviews-controls')
             review_text = review_controls.text
             if "Es liegen noch keine Bewertungen vor" in review_text:
                 rating = None
@@ -199,61 +232,166 @@ class Scraper(BaseScraper):
                 rating_div = first_child.find_all('div')[2]
                 rating = float(rating_div.contents[0].text)
             else:  # there are reviews
-                rating = float(review_controls.find('div', class_='mr-4').text)
+                rating = float(SELECTORS['review_score'].select_one(review_controls).text)
         except Exception:
             # other way of not having any reviews (interdiscount has multiple ways to display this)
             rating = None
         return rating
 
-    def _extract_all_product_links_in_category(self):
-        index = 0
-        contains_clickable_weiter_button = True
+    def _extract_all_product_links_in_category(self, category_key):
+        """
+        Yields the article links of all listing pages of the category (the page the driver is on). The first page
+        tells how many pages there are, all other pages are then fetched concurrently and their links are yielded as
+        soon as a page arrives, so the extraction of the articles starts right away.
+        """
         current_url = self._driver.current_url
-        while index < self._max_pages_to_scrape and contains_clickable_weiter_button:
-            index += 1
-            url = current_url + f'&page={index}'
-            soup = self._update_soup(url=url, sleep_timer=0.4)
-            contains_clickable_weiter_button = soup.select('a:-soup-contains("Weiter")')
-            yield from self._get_article_links(soup)
+        page_url = lambda page: current_url + f'&page={page}'
+
+        first_page = self._load_listing_page(page_url(1))
+        if first_page is None:
+            return  # not in the page cache (replay)
+        yield from self._listing_links(category_key, 1, first_page)
+        page_count = min(self._count_listing_pages(first_page), self._max_pages_to_scrape)
+
+        last_page_has_next = SELECTORS['next_page'].select_one(first_page) is not None
+        missing_pages = {}
+        for page in range(2, page_count + 1):
+            listing_page = self._checkpoints.listing_page(category_key, page) if self._checkpoints else None
+            if listing_page is not None:
+                # page was loaded before the crash, continue without loading it again
+                links, has_next = listing_page
+                yield from links
+                if page == page_count:
+                    last_page_has_next = has_next
+            else:
+                missing_pages[page] = page_url(page)
+        for page, soup in self._load_listing_pages(missing_pages):
+            yield from self._listing_links(category_key, page, soup)
+            if page == page_count:
+                last_page_has_next = SELECTORS['next_page'].select_one(soup) is not None
+
+        # the pagination might not link every page, the rest is walked with the "Weiter" button
+        yield from self._walk_listing_pages(category_key, page_url, page_count, last_page_has_next)
+
+    def _walk_listing_pages(self, category_key, page_url, page, contains_clickable_weiter_button):
+        # follows the "Weiter" links one page after the other, starting after the given page
+        while page < self._max_pages_to_scrape and contains_clickable_weiter_button:
+            page += 1
+            listing_page = self._checkpoints.listing_page(category_key, page) if self._checkpoints else None
+            if listing_page is not None:
+                links, contains_clickable_weiter_button = listing_page
+                yield from links
+                continue
+
+            soup = self._load_listing_page(page_url(page))
+            if soup is None:
+                return  # not in the page cache (replay), the pages after it are unknown
+            contains_clickable_weiter_button = SELECTORS['next_page'].select_one(soup) is not None
+            yield from self._listing_links(category_key, page, soup)
+
+    def _count_listing_pages(self, soup):
+        # the highest page number the pagination links to, 1 if there is no pagination
+        pages = [1]
+        for link in SELECTORS['pagination_links'].select(soup):
+            match = re.search(r'[?&]page=(\d+)', link.get('href', ''))
+            if match:
+                pages.append(int(match.group(1)))
+        return max(pages)
+
+    def _listing_links(self, category_key, page, soup):
+        links = list(self._get_article_links(soup))
+        if self._checkpoints is not None:
+            has_next = SELECTORS['next_page'].select_one(soup) is not None
+            self._checkpoints.record_listing_page(category_key, page, links, has_next)
+        return links
+
+    def _load_listing_page(self, url):
+        # None if the page is not in the page cache in replay mode
+        try:
+            return self._update_soup(url=url, sleep_timer=0.4, cache_state='loaded')
+        except PageCacheMiss as miss:
+            self._skip_missing_page(miss)
+            return None
+
+    def _load_listing_pages(self, urls):
+        """
+        Fetches the listing pages concurrently, with the async fetcher or the HTTP fast path. Pages that are not
+        rendered on the server (or failed) are loaded in the browser instead.
+
+        :param urls: Dict of the page numbers and the urls of the pages.
+        :return: Generator of tuples of the page number and the BeautifulSoup object, in the order the pages arrive.
+        """
+        if self._async_fetcher is None and self._http_fetcher is None:
+            for page, url in urls.items():
+                soup = self._load_listing_page(url)
+                if soup is not None:
+                    yield page, soup
+            return
+
+        futures = {}
+        executor = None
+        for page, url in urls.items():
+            try:
+                cached_soup = self._cached_soup(url)
+            except PageCacheMiss as miss:
+                self._skip_missing_page(miss)
+                continue
+            if cached_soup is not None:
+                self._count_fetch('cache')
+                yield page, cached_soup
+            elif self._async_fetcher is not None:
+                futures[self._async_fetcher.submit(url)] = (page, url)
+            else:
+                executor = executor or ThreadPoolExecutor(max_workers=self._listing_workers)
+                futures[executor.submit(self._http_fetcher.get, url)] = (page, url)
+
+        try:
+            for future in as_completed(futures):
+                page, url = futures[future]
+                html = future.result()
+                soup = parse_html(html or '')
+                if SELECTORS['listing'].select_one(soup) is None:
+                    self._count_fetch('browser')
+                    soup = self._load_listing_page(url)
+                    if soup is not None:
+                        yield page, soup
+                    continue
+                self._count_fetch('http')
+                if self._page_cache is not None:
+                    self._page_cache.put(url, html)
+                yield page, soup
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
 
     def _get_article_links(self, soup):
-        time.sleep(0.3)
         # Select the <ul> with the 'data-testid="category-wrapper"' attribute
-        ul = soup.select_one('ul[data-testid="category-wrapper"]')
+        ul = SELECTORS['listing'].select_one(soup)
 
         if ul:
             # Find all <li> > <article> > <a> inside the <ul> and extract the href attributes
-            links = ul.select('li > article > a')
+            links = SELECTORS['listing_links'].select(ul)
 
             for link in links:
                 yield link.get('href')
         else:
             print("No <ul> with data-testid='category-wrapper' found.")
 
-    def _get_brand(self, article_link, brands):
-        article_link = unicodedata.normalize('NFKD', article_link.split("/")[3]).encode('ascii', 'ignore').decode(
-            'utf-8').replace(" ", "-")  # get rid of umlaut, etc.
+    def _get_brand(self, article_link, brand_index):
+        # the product slug starts with the brand, e.g. /de/product/sony-wh-1000xm5-...
+        return brand_index.longest_prefix(article_link.split("/")[3])
 
-        for brand in brands:
-            if str(article_link).startswith(brand.name.lower().replace(" ", "-")):
-                return brand.name
-        return None
+    def _get_sub_categories(self, category, index=0):
+        # called by the workers for all categories of a level at once, see _discover_categories
+        soup = self._update_soup(self._base_url + category.url, 0.3, cache_state='loaded')
+        return self._parse_sub_categories(soup, index)
 
-    def _get_sub_categories(self, category_url, index=0):
-        soup = self._update_soup(self._base_url + category_url, 0.3)
+    def _parse_sub_categories(self, soup, index=0):
         subcategories = []
-        for subcategory in soup.select('nav > ul',
-                                       class_="divide-y divide-gray-200 overflow-hidden border-y border-y-gray-200 leading-7 text-gray-700")[
-                               2].select('li > a')[
-                           2 + index::]:  # we only want its sub categories. so the index increases per subcategory
-            subcat_url = subcategory.get('href')
-            subcat_name = subcategory.text
-            if index == 0:
-                sub_sub_cat = self._get_sub_categories(subcat_url, index=index + 1)
-            else:
-                sub_sub_cat = None
-
-            subcategories.append(Category(subcat_name, subcat_url, sub_sub_cat))
+        navigation = SELECTORS['sub_category_navigation'].select(soup)[2]
+        # we only want its sub categories. so the index increases per subcategory
+        for subcategory in SELECTORS['sub_category_links'].select(navigation)[2 + index::]:
+            subcategories.append(Category(subcategory.text, subcategory.get('href')))
         return subcategories
 
     def _click_on_selected_brands(self, brands):
@@ -261,12 +399,11 @@ class Scraper(BaseScraper):
             chosen_brand_element = self._driver.find_element(By.XPATH,
                                       f"//div[@aria-label='Optionen wählen']//div[@aria-label='{brand.name}']")
             self._driver.execute_script("arguments[0].scrollIntoView();", chosen_brand_element)
-            time.sleep(0.1)
+            self._waits.dom_quiet(timeout=0.1, label='scroll')
             self._driver.execute_script("window.scrollBy(0, -150);")
             chosen_brand_element.click()
-            time.sleep(0.1)
+            self._waits.dom_quiet(timeout=0.1, label='brand_checkbox')
 
-        wait = WebDriverWait(self._driver, 3)
-        element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "button[aria-label='Filter anwenden']")))
+        element = self._waits.element(By.CSS_SELECTOR, "button[aria-label='Filter anwenden']", label='apply_filter')
         element.click()
     pass
@@ -0,0 +1,131 @@
+import json
+import os
+
+from src.utils.category_tree_cache import walk_categories
+from src.utils.web_driver_factory import DRIVER_PROFILES
+
+try:
+    import yaml
+except ImportError:  # job specs can be written in json as well
+    yaml = None
+
+BASE_URLS = {
+    'interdiscount': "http://www.interdiscount.ch",
+    'galaxus': "http://www.galaxus.ch",
+}
+
+
+class JobSpec:
+    """
+    A scraping job that runs without any dialog: which website, which categories, sub categories and brands, how
+    many listing pages per category and how the scraper runs.
+
+    The job spec also takes the place of the selection dialogs in the scrapers (see DialogSelection), the
+    categories, sub categories and brands are picked by their names (case insensitive). Without brands, the brand
+    filter is not used and all brands are scraped.
+    """
+
+    # name -> default, every key of a job in the spec file must be one of them
+    _fields = {
+        'name': None,
+        'site': None,
+        'base_url': None,  # the website of the site by default, e.g. the mock retailer for load tests
+        'categories': [],  # names of the categories to scrape (any level), all discovered categories if empty
+        'sub_categories': [],  # only scrape these sub categories of the categories
+        'brands': [],
+        'top_categories': None,  # interdiscount only, the top level categories that are discovered
+        'max_pages': None,  # listing pages per category, the default of the scraper if None
+        'output_dir': None,  # the job writes its data/ directory here, jobs/<name> by default
+        'workers': 1,
+        'async_fetch': False,
+        'output_format': 'csv',
+        'driver_profile': 'default',
+        'cache_dir': None,
+        'replay': False,
+        'resume': False,
+        'category_ttl': 24,  # hours
+        'preprocess': True,  # interdiscount only, preprocess the scraped articles after the scrape
+        'chunk_size': None,
+        'processes': 1,
+    }
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self._fields)
+        if unknown:
+            raise ValueError(f"Unknown keys in job {values.get('name')}: {', '.join(sorted(unknown))}")
+        for key, default in self._fields.items():
+            setattr(self, key, values.get(key, default))
+
+        if not self.name:
+            raise ValueError("Every job needs a name")
+        if self.site not in BASE_URLS:
+            raise ValueError(f"Job {self.name}: site must be one of {', '.join(BASE_URLS)}, not {self.site}")
+        if self.driver_profile not in DRIVER_PROFILES:
+            raise ValueError(f"Job {self.name}: unknown driver profile {self.driver_profile}")
+        if self.output_format not in ('csv', 'parquet'):
+            raise ValueError(f"Job {self.name}: output_format must be csv or parquet")
+        self.base_url = self.base_url or BASE_URLS[self.site]
+        # the jobs run in their output directory, relative paths of the spec are relative to where it was started
+        self.output_dir = os.path.abspath(self.output_dir or os.path.join('jobs', self.name))
+        self.cache_dir = os.path.abspath(self.cache_dir) if self.cache_dir else None
+
+    def __repr__(self):
+        return f"JobSpec(name={self.name}, site={self.site})"
+
+    # the same interface as DialogSelection
+
+    def select_categories(self, categories):
+        selected = self._matching(walk_categories(categories), self.categories) if self.categories else categories
+        if not self.sub_categories:
+            return selected
+        return self._matching(walk_categories([sub_category for category in selected
+                                               for sub_category in category.subcategory or []]),
+                              self.sub_categories)
+
+    def select_sub_categories(self, category, sub_categories):
+        return self._matching(sub_categories, self.sub_categories)
+
+    def select_brands(self, category, brands):
+        return self._matching(brands, self.brands)
+
+    def _matching(self, objects, names):
+        names = {name.strip().lower() for name in names}
+        return [obj for obj in objects if obj.name.strip().lower() in names]
+
+
+def load_job_specs(path):
+    """
+    Reads the jobs of a yaml or json file. The file holds a single job, a list of jobs or a mapping with the jobs
+    and the defaults of all jobs:
+
+        defaults:
+          output_format: parquet
+        jobs:
+          - name: headphones
+            site: interdiscount
+            categories: [TV & Audio]
+            brands: [Sony, Bose]
+            max_pages: 5
+
+    :return: List of JobSpec.
+    """
+    with open(path, encoding='utf-8') as file:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError("pyyaml is required for yaml job specs, use json instead")
+            content = yaml.safe_load(file)
+        else:
+            content = json.load(file)
+
+    defaults = {}
+    if isinstance(content, dict) and 'jobs' in content:
+        defaults = content.get('defaults') or {}
+        content = content['jobs']
+    jobs = content if isinstance(content, list) else [content]
+    specs = [JobSpec(**{**defaults, **job}) for job in jobs]
+
+    names = [spec.name for spec in specs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Job names must be unique in {path}: {', '.join(sorted(duplicates))}")
+    return specs
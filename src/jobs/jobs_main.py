@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.galaxus.scraper import Scraper as GalaxusScraper
+from src.interdiscount.preprocessor import PreProcessor
+from src.interdiscount.scraper import Scraper as InterdiscountScraper
+from src.jobs.job_spec import load_job_specs
+from src.utils.metrics import METRICS
+from src.utils.scrape_run import run_scrape
+
+# Runs scraping jobs from yaml or json job specs (see src/jobs/job_spec.py) without any dialog, e.g. overnight on a
+# server without a display. The jobs run one after the other or, with --concurrency, several at once in their own
+# processes. Every job writes its data/ directory into its output_dir.
+#   python -m src.jobs.jobs_main jobs.yaml [more_jobs.json] [--concurrency 2] [--only headphones]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spec_files", nargs='+', help="yaml or json files with the jobs")
+    parser.add_argument("--concurrency", type=int, default=1, help="number of jobs that run at the same time")
+    parser.add_argument("--only", nargs='+', default=None, help="names of the jobs to run, all jobs by default")
+    return parser.parse_args()
+
+
+def run_job(spec):
+    """
+    Runs the scraper of the job (and the preprocessor of interdiscount) in the output directory of the job.
+
+    :return: The path of the scraped file.
+    """
+    os.makedirs(spec.output_dir, exist_ok=True)
+    os.chdir(spec.output_dir)  # the scrapers and the preprocessor write to data/ in the working directory
+    METRICS.reset()  # a process runs several jobs one after the other
+
+    if spec.site == 'interdiscount':
+        scraper_class = InterdiscountScraper
+        preprocessor_class = PreProcessor if spec.preprocess else None
+        scraper_options = dict(async_fetch=spec.async_fetch, top_categories=spec.top_categories)
+    else:
+        scraper_class, preprocessor_class, scraper_options = GalaxusScraper, None, {}
+    raw_path = run_scrape(spec.site, scraper_class, spec.base_url, workers=spec.workers, cache_dir=spec.cache_dir,
+                          replay=spec.replay, resume=spec.resume, output_format=spec.output_format,
+                          category_ttl=spec.category_ttl, driver_profile=spec.driver_profile,
+                          preprocessor_class=preprocessor_class, chunk_size=spec.chunk_size, processes=spec.processes,
+                          selection=spec, max_pages=spec.max_pages, **scraper_options)
+    return os.path.abspath(raw_path)
+
+
+def _run_job_logged(spec):
+    # exceptions of a job are reported and do not stop the other jobs
+    start = time.perf_counter()
+    try:
+        return spec.name, run_job(spec), None, time.perf_counter() - start
+    except Exception:
+        return spec.name, None, traceback.format_exc(), time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    specs = [spec for path in args.spec_files for spec in load_job_specs(path)]
+    if args.only:
+        specs = [spec for spec in specs if spec.name in args.only]
+    print(f"Running {len(specs)} jobs, {args.concurrency} at a time")
+
+    results = []
+    if args.concurrency > 1:
+        with ProcessPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in as_completed([executor.submit(_run_job_logged, spec) for spec in specs]):
+                results.append(future.result())
+                print(f"Job {results[-1][0]} finished")
+    else:
+        start_dir = os.getcwd()
+        for spec in specs:
+            results.append(_run_job_logged(spec))
+            os.chdir(start_dir)
+
+    failed = 0
+    for name, path, error, seconds in results:
+        if error:
+            failed += 1
+            print(f"Job {name} FAILED after {seconds:.0f}s:\n{error}")
+        else:
+            print(f"Job {name} done in {seconds:.0f}s, articles saved to {path}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,70 @@
+import json
+import math
+import os
+import shutil
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
+try:
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # parquet input and output are optional
+    ds = pq = None
+
+_worker_processor = None  # the preprocessor of a worker process, created once when the process starts
+
+
+def _init_worker(processor_class, kwargs):
+    global _worker_processor
+    _worker_processor = processor_class(None, **kwargs)
+    _worker_processor._prepare_worker()
+
+
+def _process_in_worker(df):
+    return _worker_processor._process_frame(df)
+
 
 class BasePreProcessor(ABC):
+    _float_columns = ['price', 'rating']  # typed columns of the parquet output
+    _dictionary_columns = ['category', 'sub_category', 'brand', 'source']
+    _partition_columns = ['source', 'scrape_date']  # partitions of the parquet output (if the columns exist)
+    _shards_per_process = 4  # the dataset is split into this many shards per process in the parallel mode
+
+    def __init__(self, file_path, delim='|', columns=None, filters=None, output_format='csv', chunk_size=None,
+                 resume=False, processes=1):
+        """
+        :param file_path: A csv file, a parquet file or a directory with a partitioned parquet dataset. None for the
+        preprocessors of the worker processes, which only process the shards they are given.
+        :param columns: Optional list of the columns to load, all columns by default.
+        :param filters: Optional pyarrow filters to only load some partitions of a parquet dataset,
+        e.g. [('source', '=', 'interdiscount')].
+        :param output_format: Format of the processed file, 'csv' or 'parquet'.
+        :param chunk_size: Stream the file in chunks of this many rows instead of loading it at once
+        (see _process_chunks). self.df is not loaded then.
+        :param resume: In the streaming mode, continue after the last chunk that was finished by the previous run.
+        :param processes: Number of processes that run _process_frame (see _map_frames).
+        """
+        self._file_path = file_path
+        self._delim = delim
+        self._columns = columns
+        self._filters = filters
+        self._output_format = output_format
+        self._chunk_size = chunk_size
+        self._resume = resume
+        self._processes = max(1, processes)
+        if chunk_size or file_path is None:
+            self.df = None
+            return
 
-    def __init__(self, file_path, delim='|'):
         # Load the dataset from the given file path
-        self.df = pd.read_csv(file_path, delimiter=delim)
+        if self._is_parquet():
+            self.df = self._with_partition_columns(
+                self._without_categoricals(pd.read_parquet(file_path, columns=columns, filters=filters)))
+        else:
+            self.df = pd.read_csv(file_path, delimiter=delim, usecols=columns)
 
     @abstractmethod
     def process(self):
@@ -15,3 +72,228 @@ class BasePreProcessor(ABC):
         EACH PREPROCESSOR MUST IMPLEMENT THE METHOD
         """
         pass
+
+    @abstractmethod
+    def _process_frame(self, df):
+        """
+        Processes a DataFrame (the whole dataset or a chunk of it) and returns the processed DataFrame.
+        Used by _process_and_save and by the worker processes.
+        """
+        pass
+
+    def _worker_kwargs(self):
+        """
+        Keyword arguments to create the preprocessor of a worker process with (file_path is None), they must be
+        picklable.
+        """
+        return {'output_format': self._output_format}
+
+    def _prepare_worker(self):
+        """
+        Called once in every worker process after its preprocessor was created, e.g. to load models up front.
+        """
+        pass
+
+    def _map_frames(self, frames):
+        """
+        Runs _process_frame on every DataFrame and yields the processed DataFrames in the same order.
+        With more than one process, the frames are processed by a pool of worker processes, each with its own
+        preprocessor that is created once when the process starts. At most two frames per process are in flight,
+        so a stream of chunks is never read ahead further than that.
+        """
+        if self._processes == 1:
+            for frame in frames:
+                yield self._process_frame(frame)
+            return
+
+        with ProcessPoolExecutor(max_workers=self._processes, initializer=_init_worker,
+                                 initargs=(type(self), self._worker_kwargs())) as executor:
+            pending = deque()
+            for frame in frames:
+                pending.append(executor.submit(_process_in_worker, frame))
+                if len(pending) >= 2 * self._processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _process_and_save(self, name):
+        """
+        Runs _process_frame on the whole dataset, or chunk by chunk in the streaming mode, and saves the result.
+
+        :return: The path of the saved file or dataset.
+        """
+        if self._chunk_size:
+            return self._process_chunks(name)
+        if self._processes == 1 or len(self.df) == 0:  # no shards to concatenate without rows
+            return self._save(self._process_frame(self.df), name)
+
+        # the shards are processed in parallel and merged again in their original order
+        shard_size = max(1, math.ceil(len(self.df) / (self._processes * self._shards_per_process)))
+        shards = (self.df.iloc[start:start + shard_size] for start in range(0, len(self.df), shard_size))
+        return self._save(pd.concat(self._map_frames(shards)), name)
+
+    def _process_chunks(self, name):
+        """
+        Streams the input in chunks of self._chunk_size rows through _process_frame and appends each processed chunk
+        to the output right away, so only one chunk is in memory at a time.
+
+        The csv output is written to '<path>.part' and only renamed once all chunks are done. After every chunk, the
+        number of finished chunks and the size of the output are saved in '<path>.progress'. A resumed run cuts off
+        what was written of an unfinished chunk and continues with the next chunk. The parquet output writes one
+        file per chunk, an unfinished chunk is simply written again. The partitions a run writes to are cleared
+        once when its first chunk arrives (see _clear_partitions), they are kept in the progress as well.
+
+        :return: The path of the saved file or dataset.
+        """
+        os.makedirs('data', exist_ok=True)
+        parquet = self._output_format == 'parquet'
+        path = os.path.join('data', name) if parquet else os.path.join('data', f'{name}.csv')
+        part_path = path + '.part'
+        progress_path = path + '.progress'
+
+        progress = {'input': os.path.abspath(self._file_path), 'chunk_size': self._chunk_size, 'chunks': 0, 'bytes': 0,
+                    'partitions': []}
+        if self._resume and os.path.exists(progress_path):
+            with open(progress_path, encoding='utf-8') as file:
+                saved_progress = json.load(file)
+            if all(saved_progress.get(key) == progress[key] for key in ('input', 'chunk_size')):
+                progress = saved_progress
+                print(f"Resuming after {progress['chunks']} processed chunks")
+
+        if not parquet:
+            with open(part_path, 'a', encoding='utf-8') as file:
+                file.truncate(progress['bytes'])  # drops the rows of an unfinished chunk
+
+        processed_chunks = self._map_frames(self._read_chunks(skip=progress['chunks']))
+        for index, processed in enumerate(processed_chunks, start=progress['chunks']):
+            if parquet:
+                self._clear_partitions(processed, path, progress['partitions'])
+                self._save_parquet(processed, path, basename_template=f'chunk-{index:05d}-{{i}}.parquet')
+            else:
+                with open(part_path, 'a', encoding='utf-8', newline='') as file:
+                    processed.to_csv(file, index=False, sep='|', header=index == 0)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    progress['bytes'] = file.tell()
+            progress['chunks'] = index + 1
+            self._write_progress(progress_path, progress)
+            print(f"Processed chunk {index + 1} ({len(processed)} rows)")
+
+        if not parquet:
+            os.replace(part_path, path)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        return path
+
+    def _read_chunks(self, skip=0):
+        # yields the input in DataFrames of self._chunk_size rows, without the first skip chunks
+        if self._is_parquet():
+            if ds is None:
+                raise ImportError("pyarrow is required for the parquet input")
+            dataset = ds.dataset(self._file_path, format='parquet', partitioning='hive')
+            filter_expression = pq.filters_to_expression(self._filters) if self._filters else None
+            batches = dataset.to_batches(columns=self._columns, filter=filter_expression, batch_size=self._chunk_size)
+            # the batches of a dataset can be smaller than batch_size, they are regrouped into full chunks
+            buffered, buffered_rows, index = [], 0, 0
+            for batch in batches:
+                buffered.append(self._with_partition_columns(batch.to_pandas()))
+                buffered_rows += batch.num_rows
+                if buffered_rows >= self._chunk_size:
+                    frame = pd.concat(buffered, ignore_index=True)
+                    for start in range(0, len(frame) - self._chunk_size + 1, self._chunk_size):
+                        if index >= skip:
+                            yield self._without_categoricals(frame.iloc[start:start + self._chunk_size]
+                                                             .reset_index(drop=True))
+                        index += 1
+                    rest = frame.iloc[len(frame) - len(frame) % self._chunk_size:]
+                    buffered, buffered_rows = [rest], len(rest)
+            if buffered_rows and index >= skip:
+                yield self._without_categoricals(pd.concat(buffered, ignore_index=True))
+            return
+
+        # the rows of the finished chunks are skipped by the csv reader, without parsing them into DataFrames
+        yield from pd.read_csv(self._file_path, delimiter=self._delim, usecols=self._columns,
+                               chunksize=self._chunk_size, skiprows=range(1, skip * self._chunk_size + 1))
+
+    def _write_progress(self, path, progress):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(progress, file)
+        os.replace(tmp_path, path)
+
+    def _is_parquet(self):
+        return os.path.isdir(self._file_path) or self._file_path.endswith('.parquet')
+
+    def _without_categoricals(self, df):
+        # dictionary encoded columns are loaded as categoricals, which cannot take new (e.g. translated) values
+        for column in df.select_dtypes('category').columns:
+            df[column] = df[column].astype(object)
+        return df
+
+    def _save(self, df, name):
+        """
+        Saves the processed data to data/<name>.csv or, with the parquet output, as typed parquet dataset in
+        data/<name>/ (partitioned by source and scrape date if the columns exist).
+
+        :return: The path of the saved file or dataset.
+        """
+        os.makedirs('data', exist_ok=True)
+        if self._output_format != 'parquet':
+            path = os.path.join('data', f'{name}.csv')
+            df.to_csv(path, index=False, sep='|')
+            return path
+
+        partitioned = any(column in df for column in self._partition_columns)
+        path = os.path.join('data', name) if partitioned else os.path.join('data', f'{name}.parquet')
+        self._clear_partitions(df, path, [])
+        self._save_parquet(df, path)
+        return path
+
+    def _clear_partitions(self, df, path, cleared):
+        """
+        Removes the partitions of the parquet output that df is written to, so they do not keep the files of earlier
+        runs (e.g. of the same scrape date) next to the new ones. The other partitions, e.g. of other scrape dates,
+        are kept. An output without partitions is removed as a whole.
+
+        :param cleared: Partition directories that were already cleared by this run, the new ones are appended.
+        """
+        partition_columns = [column for column in self._partition_columns if column in df]
+        values = df[partition_columns].drop_duplicates().itertuples(index=False) if partition_columns else [()]
+        for partition in values:
+            directory = os.path.join(path, *(f"{column}={value}"
+                                             for column, value in zip(partition_columns, partition)))
+            if directory not in cleared:
+                self._remove_output(directory)
+                cleared.append(directory)
+
+    def _with_partition_columns(self, df):
+        # a single file of a hive partitioned dataset (e.g. the raw file of the scraper) does not carry the columns of
+        # its partition directories, they are taken from its path
+        if not self._file_path.endswith('.parquet'):
+            return df
+        for directory in os.path.dirname(os.path.abspath(self._file_path)).split(os.sep):
+            column, separator, value = directory.partition('=')
+            if separator and column not in df and (self._columns is None or column in self._columns):
+                df[column] = value
+        return df
+
+    def _remove_output(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _save_parquet(self, df, path, **kwargs):
+        typed_df = df.copy()
+        for column in self._float_columns:
+            if column in typed_df:
+                typed_df[column] = pd.to_numeric(typed_df[column], errors='coerce')
+        for column in self._dictionary_columns:
+            if column in typed_df:
+                typed_df[column] = typed_df[column].astype('category')
+        partition_columns = [column for column in self._partition_columns if column in typed_df]
+        if not partition_columns and kwargs:
+            os.makedirs(path, exist_ok=True)  # the chunks of the streaming mode are files in the output directory
+            path = os.path.join(path, kwargs['basename_template'].replace('-{i}', ''))
+            kwargs = {}
+        typed_df.to_parquet(path, index=False, partition_cols=partition_columns or None, **kwargs)
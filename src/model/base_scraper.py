@@ -1,20 +1,79 @@
+import datetime
 import gc
 import os
-import time
+import threading
 from abc import ABC, abstractmethod
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
-from src.utils.web_driver_factory import WebDriverFactory
+from src.utils.async_fetcher import AsyncFetcher
+from src.utils.category_tree_cache import category_fingerprint, walk_categories
+from src.utils.html_parser import DomSoupCache, parse_html
+from src.utils.http_fetcher import HttpFetcher
+from src.utils.metrics import METRICS
+from src.utils.output_sink import CsvSink, ParquetSink
+from src.utils.page_cache import PageCacheMiss
+from src.utils.wait_engine import WaitEngine, WaitProfile
+from src.utils.web_driver_factory import DRIVER_PROFILES, WebDriverFactory, WebDriverPool
 
 
 class BaseScraper(ABC):
-    def __init__(self, base_url):
+    _source = None  # name of the website, used to partition the parquet output
+    _max_pages_per_driver = 300  # recycle a driver after this many pages so firefox does not eat all the memory
+    _max_driver_memory_mb = 1500  # or as soon as its processes use more memory than this
+    _wait_profile = WaitProfile()  # timeouts of the website, overridden by the scrapers
+    _driver_profile = DRIVER_PROFILES['default']  # how the browser loads the pages, see DriverProfile
+    _use_http_fast_path = False  # try a plain HTTP GET before loading a page in the browser (server-side rendered sites)
+    _async_prefetch = 48  # product pages that are fetched ahead of the parsing in async mode
+    _save_interval = 200  # write the scraped rows to disk every n articles
+    _float_columns = ['price', 'rating', 'article_count']  # typed columns of the parquet output
+    _dictionary_columns = ['category', 'sub_category', 'brand', 'brand_name']
+
+    def __init__(self, base_url, workers=1, async_fetch=False, page_cache=None, checkpoints=None,
+                 output_format='csv', category_cache=None, driver_profile=None, selection=None, max_pages=None):
         self._base_url = base_url
-        self._driver = WebDriverFactory.create_driver()
+        if driver_profile is not None:
+            self._driver_profile = driver_profile
+        # picks the categories, sub categories and brands to scrape, a DialogSelection or a JobSpec
+        self._selection = selection
+        if max_pages is not None:
+            self._max_pages_to_scrape = max_pages
+        self._category_cache = category_cache  # optional CategoryTreeCache, skips the category discovery
+        self._output_format = output_format  # 'csv' or 'parquet'
+        self._checkpoints = checkpoints  # optional CheckpointStore, lets a crashed run be resumed
+        self._page_cache = page_cache  # optional PageCache, in replay mode cached pages are never fetched again
+        self._workers = max(1, workers)  # number of drivers used to extract the article details
+        self._local = threading.local()  # holds the driver of a worker thread
+        self._worker_drivers = {}
+        # one driver per worker, the main driver and a warm spare
+        self._driver_pool = WebDriverPool(size=self._workers + 2 if self._workers > 1 else 2,
+                                          max_pages=self._max_pages_per_driver,
+                                          max_rss_mb=self._max_driver_memory_mb,
+                                          create_driver=lambda: WebDriverFactory.create_driver(
+                                              profile=self._driver_profile))
+        self._driver = self._driver_pool.checkout()
+        self._waits = WaitEngine(lambda: self._driver, self._wait_profile)
+        self._dom_soups = DomSoupCache()  # the page source is only parsed again if the DOM changed
+        self._http_fetcher = HttpFetcher(pool_size=self._workers + 1) if self._use_http_fast_path else None
+        # fetches many pages at once without a browser, used by the scrapers that support it
+        self._async_fetcher = AsyncFetcher() if async_fetch else None
+        self._fetch_stats = Counter()  # how many pages were fetched by which path
+        self._fetch_stats_lock = threading.Lock()
+
+    @property
+    def _driver(self):
+        # worker threads use their own driver, everything else uses the main driver
+        return getattr(self._local, 'driver', None) or self._main_driver
+
+    @_driver.setter
+    def _driver(self, driver):
+        if getattr(self._local, 'driver', None) is not None:
+            self._local.driver = driver
+            self._worker_drivers[threading.get_ident()] = driver
+        else:
+            self._main_driver = driver
 
     @abstractmethod
     def scrape(self):
@@ -23,15 +82,31 @@ class BaseScraper(ABC):
         """
         pass
 
+    @abstractmethod
+    def _article_row(self, article):
+        """
+        Returns the output row (dict) of a scraped article.
+        """
+        pass
+
     def _wait_until_element_located(self, by, value, action=None, sleep_time=0):
+        """
+        Waits for the element, scrolls to it and optionally performs an action on it.
+
+        :param sleep_time: Upper bound for waiting until the page settled after each scroll (default is 0).
+        :return: The element (or its text for action 'text'), None if it was not found.
+        """
         try:
-            wait = WebDriverWait(self._driver, 3)
-            element = wait.until(EC.presence_of_element_located((by, value)))
+            element = self._waits.element(by, value, label='element_located')
+            if element is None:
+                return None
 
             self._driver.execute_script("arguments[0].scrollIntoView();", element)
-            time.sleep(sleep_time)
+            if sleep_time:
+                self._waits.dom_quiet(timeout=sleep_time, label='scroll')
             self._driver.execute_script("window.scrollBy(0, -150);")
-            time.sleep(sleep_time)
+            if sleep_time:
+                self._waits.dom_quiet(timeout=sleep_time, label='scroll')
 
             if action == 'click':
                 element.click()
@@ -43,38 +118,298 @@ class BaseScraper(ABC):
         except Exception as e:
             return None
 
+    def _extract_articles(self, extract, links, category_key):
+        """
+        Extracts the articles behind the links (see _map_in_workers) and records each one in the checkpoint store.
+        Links that were already finished in a previous run are skipped.
+
+        :param extract: Function that extracts the article of a link. In async mode, it is called with the link and the
+        prefetched html of the article page.
+        :param links: Iterable of article links (relative to the base url in async mode).
+        :param category_key: Identifies the category in the checkpoint store (e.g. its url).
+        :return: Generator of the articles, in the order of the links.
+        """
+        if self._checkpoints is not None:
+            completed_links = self._checkpoints.completed_links(category_key)
+            if completed_links:
+                print(f"Skipping {len(completed_links)} articles that were scraped before")
+            links = (link for link in links if link not in completed_links)
+
+        def extract_or_skip(link, *html):
+            # in replay, an article whose page was never cached is skipped instead of ending the whole replay
+            try:
+                return link, extract(link, *html)
+            except PageCacheMiss as miss:
+                self._skip_missing_page(miss)
+                return link, None
+
+        if self._async_fetcher is not None:
+            results = self._map_prefetched(extract_or_skip, links)
+        else:
+            results = self._map_in_workers(extract_or_skip, links)
+
+        for link, article in results:
+            if article is None:
+                continue
+            if self._checkpoints is not None:
+                self._checkpoints.record_article(link, category_key, self._article_row(article))
+            yield article
+
+    def _discover_categories(self, load_roots, load_children, max_depth, cache_key=None):
+        """
+        Loads the category tree breadth-first. The categories of one level are loaded concurrently by the workers
+        (see _map_in_workers), instead of one page after the other while descending.
+
+        If the category cache holds a tree that is not expired, no page is loaded at all. An expired tree is refreshed:
+        a branch whose sub category listing did not change is taken over from the cache without loading its pages.
+
+        :param load_roots: Function that returns the top level categories.
+        :param load_children: Function that is called with a category and its depth (0 for the top level) and returns
+        the sub categories found on its page.
+        :param max_depth: Number of levels below the top level categories that are loaded.
+        :param cache_key: Identifies the selection the tree was discovered with (e.g. the top level categories), a
+        cached tree of another selection is not used.
+        :return: The top level categories with their sub categories.
+        """
+        cached_tree = self._category_cache.load(cache_key) if self._category_cache is not None else None
+        if cached_tree is not None and not cached_tree[1]:
+            print("Using the cached category tree")
+            return cached_tree[0]
+        cached_categories = {category.url: category for category in walk_categories(cached_tree and cached_tree[0])}
+
+        roots = load_roots()
+        level = [category for category in roots if category.url]
+        reused = 0
+        for depth in range(max_depth):
+            children_per_category = self._map_in_workers(lambda category: load_children(category, depth), level)
+            next_level = []
+            for category, children in zip(level, children_per_category):
+                category.fingerprint = category_fingerprint(children)
+                cached_category = cached_categories.get(category.url)
+                if cached_category is not None and cached_category.fingerprint == category.fingerprint:
+                    category.subcategory = cached_category.subcategory  # unchanged branch
+                    reused += 1
+                else:
+                    category.subcategory = children
+                    next_level.extend(child for child in children if child.url)
+            level = next_level
+
+        if cached_tree is not None:
+            print(f"Refreshed the category tree, {reused} unchanged branches taken from the cache")
+        if self._category_cache is not None:
+            self._category_cache.save(roots, cache_key)
+        return roots
+
+    def _resumed_rows(self):
+        # output rows of the articles that were scraped before the last run crashed
+        return self._checkpoints.rows() if self._checkpoints is not None else []
+
+    def _map_prefetched(self, func, links):
+        """
+        Fetches the pages of the next links concurrently with the async fetcher while the previous ones are parsed.
+
+        :param func: Function that is called with a link and the html of its page (None if the request failed).
+        :param links: Iterable of links relative to the base url.
+        :return: Generator of the results of func, in the order of the links.
+        """
+        pending = deque()
+        for link in links:
+            pending.append((link, self._async_fetcher.submit(self._base_url + link)))
+            if len(pending) >= self._async_prefetch:
+                link, future = pending.popleft()
+                yield func(link, future.result())
+                self._release_memory()  # func may still load the page in the browser (e.g. dynamic reviews)
+        while pending:
+            link, future = pending.popleft()
+            yield func(link, future.result())
+            self._release_memory()
+
+    def _map_in_workers(self, func, items):
+        """
+        Applies func to every item and yields the results in the order of the items.
+        With more than one worker, the items are spread over that many drivers, each running in its own thread.
+        At most two items per worker are in flight, so the items (e.g. the links of a listing walk) are consumed
+        while the results are yielded and not all at once.
+
+        :param func: Function that is called with a single item. It may use self._driver.
+        :param items: Iterable of items (e.g. article links).
+        :return: Generator of the results of func, in input order.
+        """
+        if self._workers == 1:
+            for item in items:
+                yield func(item)
+                self._release_memory()
+            return
+
+        def init_worker():
+            self._local.driver = self._driver_pool.checkout()
+            self._worker_drivers[threading.get_ident()] = self._local.driver
+
+        def run(item):
+            result = func(item)
+            self._release_memory()
+            return result
+
+        executor = ThreadPoolExecutor(max_workers=self._workers, initializer=init_worker)
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(run, item))
+                if len(pending) >= 2 * self._workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # after an error or when the consumer stops early, the items that did not start are dropped and the
+            # running ones finish before their drivers are checked in
+            executor.shutdown(wait=True, cancel_futures=True)
+            for driver in self._worker_drivers.values():
+                self._driver_pool.checkin(driver)
+            self._worker_drivers.clear()
+
     def _release_memory(self):
-        self._quit_driver()
-        self._driver = WebDriverFactory.create_driver()
-        gc.collect()
+        # swaps the current driver for a warm one if it loaded too many pages or uses too much memory.
+        # the old driver is quit in the background, so this does not stall the scraping
+        driver = self._driver_pool.renew(self._driver)
+        if driver is not self._driver:
+            self._driver = driver
+            gc.collect()
 
     def _quit_driver(self):
-        self._driver.quit()
+        self._driver_pool.checkin(self._driver)
+        self._driver_pool.close()
+        if self._http_fetcher is not None:
+            self._http_fetcher.close()
+        if self._async_fetcher is not None:
+            self._async_fetcher.close()
+        if self._checkpoints is not None:
+            self._checkpoints.close()
         print("Driver has been closed.")
 
+    @property
+    def _replaying(self):
+        return self._page_cache is not None and self._page_cache.replay
+
+    def _page_url(self):
+        # the url that was last requested by this thread (the driver's url may differ after redirects)
+        return getattr(self._local, 'page_url', None) or self._driver.current_url
+
+    def _get_page(self, url):
+        self._local.page_url = url  # the url the page cache uses for reads of this page after interactions
+        with METRICS.span('page_load', source=self._source, profile=self._driver_profile.name):
+            self._driver.get(url)
+        self._driver_pool.record_page(self._driver)
+
     def save_to_csv(self, df, file_name, separator='|', index=False):
+        file_path = self._data_path(file_name)
+        df.to_csv(file_path, sep=separator, index=index)
+        return file_path
+
+    def _open_sink(self, file_name, columns, separator='|'):
+        """
+        Opens a sink that appends rows to data/<file_name> while scraping (see CsvSink). Use it as a context
+        manager, the file is only moved to its final name once the block finished without an error.
+        With the parquet output, the rows are written to data/<name>/source=<source>/scrape_date=<today>/ instead.
+        """
+        if self._output_format == 'parquet':
+            partition = {'source': self._source, 'scrape_date': datetime.date.today().isoformat()}
+            return ParquetSink(self._data_path(os.path.splitext(file_name)[0]), columns, partition,
+                               self._float_columns, self._dictionary_columns, flush_rows=self._save_interval)
+        return CsvSink(self._data_path(file_name), columns, separator, flush_rows=self._save_interval)
+
+    def _data_path(self, file_name):
         data_dir = os.path.join(os.getcwd(), 'data')
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-        file_path = os.path.join(data_dir, file_name)
-        df.to_csv(file_path, sep=separator, index=index)
-        return file_path
+        return os.path.join(data_dir, file_name)
 
-    def _update_soup(self, url=None, sleep_timer=None):
+    def _fetch_soup(self, url, required_selectors=(), html=None):
+        """
+        Fetches the page with a plain HTTP GET if the scraper uses the fast path. Falls back to the browser if the
+        request fails or any of the required selectors is missing in the server-side rendered html.
+
+        :param url: The URL to fetch the page from.
+        :param required_selectors: Compiled selectors (see compile_selectors) that must all match for the static html
+        to be used.
+        :param html: Html of the page that was already fetched (e.g. by the async fetcher), no GET is done then.
+        :return: Tuple of the BeautifulSoup object and whether the page was loaded in the browser.
+        """
+        cached_soup = self._cached_soup(url)
+        if cached_soup is not None:
+            self._count_fetch('cache')
+            return cached_soup, False
+
+        if html is None and self._http_fetcher is not None:
+            html = self._http_fetcher.get(url)
+        if html:
+            soup = parse_html(html)
+            if all(selector.select_one(soup) for selector in required_selectors):
+                self._count_fetch('http')
+                if self._page_cache is not None:
+                    self._page_cache.put(url, html)
+                return soup, False
+
+        self._count_fetch('browser')
+        return self._update_soup(url, cache_state='loaded'), True
+
+    def _cached_soup(self, url, state='loaded'):
+        """
+        :return: BeautifulSoup object of the cached page, None if it is not cached.
+        :raises PageCacheMiss: In replay mode, if the page is not cached.
+        """
+        if self._page_cache is None:
+            return None
+        html = self._page_cache.get(url, state)
+        if html is not None:
+            return parse_html(html)
+        if self._page_cache.replay:
+            raise PageCacheMiss(url, state)
+        return None
+
+    def _skip_missing_page(self, miss):
+        print(f"Skipping {miss.url}, it is not in the page cache (state '{miss.state}')")
+        METRICS.increment('replay_misses', state=miss.state)
+
+    def _count_fetch(self, path):
+        with self._fetch_stats_lock:
+            self._fetch_stats[path] += 1
+        METRICS.increment('pages_fetched', path=path)
+
+    def _print_fetch_summary(self):
+        total = sum(self._fetch_stats.values())
+        if total == 0:
+            return
+        print("Pages fetched per path:")
+        for path, count in self._fetch_stats.most_common():
+            print(f"  {path}: {count} ({count / total * 100:.1f}%)")
+
+    def _update_soup(self, url=None, sleep_timer=None, cache_state=None):
         """
         Fetches the page source from the given URL and returns the BeautifulSoup object.
 
         :param url: The URL to fetch the page from.
-        :param sleep_timer: Optional sleep time before fetching the page source (default is None).
+        :param sleep_timer: Optional upper bound for waiting until the DOM settled before fetching the page source
+        (default is None).
+        :param cache_state: Interaction state of the page (e.g. 'loaded'), the page is only served from and stored in
+        the page cache if it is given. Pages the driver still has to interact with afterwards must not pass it.
         :return: BeautifulSoup object parsed from the fetched page.
         """
+        if cache_state is not None and self._page_cache is not None:
+            page_url = url or self._page_url()
+            soup = self._cached_soup(page_url, cache_state)
+            if soup is not None:
+                self._local.page_url = page_url
+                return soup
+
         if url:
-            self._driver.get(url)
+            self._get_page(url)
 
         if sleep_timer is not None:
-            time.sleep(sleep_timer)
+            self._waits.dom_quiet(timeout=sleep_timer, label='update_soup')
 
-        html = self._driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-        return soup
+        if cache_state is not None and self._page_cache is not None:
+            html = self._driver.page_source
+            self._page_cache.put(self._page_url(), html, cache_state)
+            return parse_html(html)
+        return self._dom_soups.soup(self._driver)
 
@@ -0,0 +1,81 @@
+import os
+import unicodedata
+
+import pandas as pd
+
+
+class BrandIndex:
+    """
+    Prefix trie of brand names, answers which brand a product slug or name starts with.
+
+    Brand names and the looked up texts are normalized the same way as the product slugs of the retailers
+    (umlauts and accents removed, lowercase, spaces as '-'), so 'Bang & Olufsen' matches both
+    'bang-&-olufsen-beoplay' and 'BANG & OLUFSEN Beoplay'. A lookup walks the trie along the text once, so it takes
+    time proportional to the length of the text, no matter how many brands are indexed.
+    """
+
+    def __init__(self, brands=()):
+        """
+        :param brands: Brand objects or brand names.
+        """
+        self._root = {}
+        self._size = 0
+        for brand in brands:
+            self.add(brand.name if hasattr(brand, 'name') else brand)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Builds the index of the brands in brands.csv (written by the scrapers) or in a brands parquet dataset.
+        """
+        if os.path.isdir(path) or path.endswith('.parquet'):
+            brands = pd.read_parquet(path, columns=['brand_name'])['brand_name']
+        else:
+            brands = pd.read_csv(path, usecols=['brand_name'])['brand_name']
+        return cls(name for name in brands.dropna().astype(str).unique())
+
+    def add(self, name):
+        node = self._root
+        for character in self._normalize(name):
+            node = node.setdefault(character, {})
+        if None not in node:  # the first spelling of a brand is kept
+            node[None] = name
+            self._size += 1
+
+    def match(self, text):
+        """
+        Finds the longest brand the text starts with. The brand must end at a word boundary of the text, so 'LG'
+        does not match 'LGA 1700'.
+
+        :return: Tuple of the brand name and the number of characters of the text it covers, None if no brand matches.
+        """
+        node = self._root
+        match = None
+        for end, character in enumerate(text):
+            if None in node and not self._normalize_character(character).isalnum():
+                match = (node[None], end)
+            for normalized in self._normalize_character(character):
+                node = node.get(normalized)
+                if node is None:
+                    return match
+        if None in node:
+            match = (node[None], len(text))
+        return match
+
+    def longest_prefix(self, text):
+        """
+        :return: The name of the longest brand the text starts with, None if no brand matches.
+        """
+        match = self.match(text)
+        return match[0] if match else None
+
+    def _normalize(self, text):
+        return "".join(self._normalize_character(character) for character in text.strip())
+
+    def _normalize_character(self, character):
+        # get rid of umlaut, etc. like the product slugs do
+        normalized = unicodedata.normalize('NFKD', character).encode('ascii', 'ignore').decode('utf-8').lower()
+        return '-' if normalized == ' ' else normalized
+
+    def __len__(self):
+        return self._size
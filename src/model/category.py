@@ -1,8 +1,9 @@
 class Category:
-    def __init__(self, name, url, subcategories=None):
+    def __init__(self, name, url, subcategories=None, fingerprint=None):
         self.name = name
         self.url = url
         self.subcategory = subcategories
+        self.fingerprint = fingerprint  # hash of the sub category listing, used to refresh changed branches only
 
     def __repr__(self):
         return f"Category(name={self.name}, url={self.url})"
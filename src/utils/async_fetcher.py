@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import aiohttp
+
+from src.utils.http_fetcher import HttpFetcher
+from src.utils.metrics import METRICS
+
+
+class AsyncFetcher:
+    """
+    Fetches pages concurrently on an asyncio event loop that runs in a background thread.
+
+    All requests share one aiohttp session, so connections are kept alive and reused. The connector limits the
+    number of open connections in total and per host, which is what keeps us from hammering a single retailer.
+    The scrapers only call submit and wait on the returned futures, they never touch the event loop themselves.
+    """
+
+    def __init__(self, max_connections=20, max_connections_per_host=6, timeout=15):
+        self._max_connections = max_connections
+        self._max_connections_per_host = max_connections_per_host
+        self._timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-fetcher", daemon=True)
+        self._thread.start()
+        self._session = asyncio.run_coroutine_threadsafe(self._create_session(), self._loop).result()
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self._max_connections, limit_per_host=self._max_connections_per_host,
+                                         keepalive_timeout=30)
+        return aiohttp.ClientSession(connector=connector, headers=HttpFetcher._headers,
+                                     timeout=aiohttp.ClientTimeout(total=self._timeout))
+
+    async def _fetch(self, url):
+        try:
+            with METRICS.span('async_fetch'):
+                async with self._session.get(url) as response:
+                    if response.status != 200:
+                        return None
+                    return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"HTTP request to {url} failed: {e}")
+            return None
+
+    def submit(self, url):
+        """
+        Starts fetching the page without waiting for it.
+
+        :return: concurrent.futures.Future that resolves to the html of the page or None if the request failed.
+        """
+        return asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
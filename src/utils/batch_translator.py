@@ -0,0 +1,98 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.utils.metrics import METRICS
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+
+
+class BatchTranslator:
+    """
+    Translates whole DataFrame columns with as few requests as possible.
+
+    The distinct texts of all columns are collected first, texts that are in the translation cache are skipped.
+    The rest is split into sentences, packed into batches of up to max_chars of the backend and the batches are
+    translated concurrently by max_workers threads. The translations are mapped back onto the columns.
+    """
+
+    def __init__(self, backend, cache=None, max_workers=4):
+        self._backend = backend
+        self._cache = cache  # optional TranslationCache
+        self._max_workers = max_workers
+
+    def translate_columns(self, df, columns):
+        """
+        :return: Dict of the column names and their translated Series. Values that are not strings become ''.
+        """
+        texts = pd.unique(pd.concat([df[column] for column in columns], ignore_index=True))
+        translations = self.translate_texts([text for text in texts if isinstance(text, str)])
+        return {column: df[column].map(translations).fillna('') for column in columns}
+
+    def translate_texts(self, texts):
+        """
+        :return: Dict of the (distinct) texts and their translations.
+        """
+        translations = {'': ''}
+        missing = []
+        cached_count = 0
+        for text in dict.fromkeys(texts):
+            if not text.strip():
+                translations[text] = ''
+                continue
+            cached = self._cache.get(self._backend.source, self._backend.target, text) if self._cache else None
+            if cached is not None:
+                translations[text] = cached
+                cached_count += 1
+            else:
+                missing.append(text)
+
+        # every text is split into segments that are translated separately and joined again afterwards
+        segments_per_text = [self._split(text) for text in missing]
+        segments = list(dict.fromkeys(segment for text_segments in segments_per_text for segment in text_segments))
+        translated_segments = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            for batch, translated_batch in executor.map(self._translate_batch, self._pack(segments)):
+                translated_segments.update(zip(batch, translated_batch))
+
+        for text, text_segments in zip(missing, segments_per_text):
+            translation = " ".join(translated_segments[segment] for segment in text_segments)
+            translations[text] = translation
+            if self._cache is not None:
+                self._cache.put(self._backend.source, self._backend.target, text, translation)
+        METRICS.increment('translated_texts', len(missing))
+        METRICS.increment('cached_translations', cached_count)
+        print(f"Translated {len(missing)} texts in {len(segments)} segments, {cached_count} texts were cached")
+        return translations
+
+    def _translate_batch(self, batch):
+        with METRICS.span('translation_batch'):
+            return batch, self._backend.translate_batch(batch)
+
+    def _split(self, text):
+        # splits the text at sentence boundaries into segments that fit into a single request. a sentence that is
+        # longer than that is split at the last space before the limit
+        max_chars = self._backend.max_chars
+        segments = []
+        for sentence in _SENTENCE_END.split(" ".join(text.split())):  # also gets rid of the line breaks
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                segments.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                segments.append(sentence)
+        return segments
+
+    def _pack(self, segments):
+        # packs the segments into batches that are as long as possible (joined by line breaks)
+        batch, length = [], 0
+        for segment in segments:
+            if batch and length + 1 + len(segment) > self._backend.max_chars:
+                yield batch
+                batch, length = [], 0
+            length += len(segment) + (1 if batch else 0)
+            batch.append(segment)
+        if batch:
+            yield batch
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import time
+
+from src.model.category import Category
+
+
+class CategoryTreeCache:
+    """
+    Keeps the discovered category tree of a website in a json file, so later runs can start scraping right away.
+
+    A tree that is older than ttl seconds is still returned, but marked as expired. The scraper then reloads the
+    category pages level by level and only descends into the branches whose sub category listing changed
+    (see category_fingerprint), the other branches are taken over from the cached tree.
+    """
+
+    def __init__(self, path=os.path.join('data', 'categories.json'), ttl=24 * 3600):
+        self._path = path
+        self._ttl = ttl
+
+    def load(self, key=None):
+        """
+        :param key: The key the tree was saved with, e.g. the selected top level categories.
+        :return: Tuple of the cached root categories and whether they are expired, None if nothing is cached (or only
+        a tree with another key).
+        """
+        try:
+            with open(self._path, encoding='utf-8') as file:
+                tree = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if tree.get('key') != self._key(key):
+            return None
+        categories = [self._from_dict(category) for category in tree['categories']]
+        return categories, time.time() - tree['saved_at'] > self._ttl
+
+    def save(self, categories, key=None):
+        os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'saved_at': time.time(), 'key': self._key(key),
+                       'categories': [self._to_dict(category) for category in categories]}, file, ensure_ascii=False)
+        os.replace(tmp_path, self._path)
+
+    def _key(self, key):
+        # the key as it is stored in the json file
+        return None if key is None else hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _to_dict(self, category):
+        return {
+            'name': category.name,
+            'url': category.url,
+            'fingerprint': category.fingerprint,
+            'subcategories': None if category.subcategory is None
+            else [self._to_dict(subcategory) for subcategory in category.subcategory]
+        }
+
+    def _from_dict(self, category):
+        subcategories = category['subcategories']
+        return Category(category['name'], category['url'],
+                        None if subcategories is None else [self._from_dict(subcategory) for subcategory in subcategories],
+                        category['fingerprint'])
+
+
+def category_fingerprint(subcategories):
+    # identifies the sub category listing of a page, independent of the order of the entries
+    entries = sorted(f"{category.name}\n{category.url}" for category in subcategories or [])
+    return hashlib.sha256("\n\n".join(entries).encode('utf-8')).hexdigest()
+
+
+def walk_categories(categories):
+    # yields all categories of the tree, breadth-first
+    level = list(categories or [])
+    while level:
+        yield from level
+        level = [subcategory for category in level for subcategory in category.subcategory or []]
@@ -0,0 +1,77 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class CheckpointStore:
+    """
+    Crash-safe record of the scraping progress in SQLite.
+
+    Every extracted article is committed together with its output row as soon as it is scraped, as is every
+    listing page with the article links found on it. A resumed run skips the finished articles, does not reload
+    listing pages it has already seen and re-emits the rows that were scraped before the crash.
+    """
+
+    def __init__(self, path=os.path.join('data', 'checkpoint.sqlite'), resume=False):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS articles (link TEXT PRIMARY KEY, category TEXT, row TEXT)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS listing_pages "
+            "(category TEXT, page INTEGER, links TEXT, has_next INTEGER, PRIMARY KEY (category, page))")
+        if not resume:
+            self.clear()
+        self._connection.commit()
+
+    def completed_links(self, category):
+        with self._lock:
+            cursor = self._connection.execute("SELECT link FROM articles WHERE category = ?", (category,))
+            return {link for (link,) in cursor}
+
+    def rows(self):
+        """
+        :return: The output rows of all finished articles, in the order they were scraped.
+        """
+        with self._lock:
+            cursor = self._connection.execute("SELECT row FROM articles ORDER BY rowid")
+            return [json.loads(row) for (row,) in cursor]
+
+    def record_article(self, link, category, row):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO articles (link, category, row) VALUES (?, ?, ?)",
+                                     (link, category, json.dumps(row)))
+            self._connection.commit()
+
+    def listing_page(self, category, page):
+        """
+        :return: Tuple of the article links on the page and whether there is a next page, None if the page was
+        not loaded yet.
+        """
+        with self._lock:
+            result = self._connection.execute(
+                "SELECT links, has_next FROM listing_pages WHERE category = ? AND page = ?",
+                (category, page)).fetchone()
+        if result is None:
+            return None
+        return json.loads(result[0]), bool(result[1])
+
+    def record_listing_page(self, category, page, links, has_next):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO listing_pages (category, page, links, has_next) VALUES (?, ?, ?, ?)",
+                (category, page, json.dumps(links), int(has_next)))
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM articles")
+            self._connection.execute("DELETE FROM listing_pages")
+            self._connection.commit()
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,61 @@
+import threading
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+from src.utils.metrics import METRICS
+
+try:
+    import lxml  # noqa: F401  (only checks if the fast parser is installed)
+    PARSER_BACKEND = 'lxml'
+except ImportError:
+    PARSER_BACKEND = 'html.parser'
+
+# Installs a MutationObserver (once per document) that counts the DOM mutations. Together with the time origin of
+# the document, the count identifies the version of the DOM.
+_DOM_VERSION_JS = """
+if (window.__cipMutationCount === undefined) {
+    window.__cipMutationCount = 0;
+    new MutationObserver(function (mutations) { window.__cipMutationCount += mutations.length; })
+        .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+return [performance.timeOrigin, window.__cipMutationCount];
+"""
+
+
+def parse_html(html):
+    # lxml is about an order of magnitude faster than the pure python html.parser
+    with METRICS.span('parse'):
+        return BeautifulSoup(html, PARSER_BACKEND)
+
+
+def compile_selectors(selectors):
+    """
+    Precompiles a table of CSS selectors. The compiled selectors are used with selectors['name'].select_one(soup)
+    or .select(soup), their CSS is available as selectors['name'].pattern (e.g. for the selenium waits).
+    """
+    return {name: soupsieve.compile(selector) for name, selector in selectors.items()}
+
+
+class DomSoupCache:
+    """
+    Parses the page source of a driver, but only if the DOM changed since the last parse in the same thread.
+    Asking the page for its DOM version is a lot cheaper than serializing and parsing the whole page again.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def soup(self, driver):
+        try:
+            version = driver.execute_script(_DOM_VERSION_JS)
+        except Exception:
+            version = None  # e.g. no javascript on the page, always parse then
+        if version is not None and version == getattr(self._local, 'version', None):
+            METRICS.increment('parses_skipped')
+            return self._local.soup
+
+        soup = parse_html(driver.page_source)
+        self._local.version = version
+        self._local.soup = soup
+        return soup
@@ -0,0 +1,41 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.metrics import METRICS
+
+
+class HttpFetcher:
+    """
+    Plain HTTP GETs over a pooled keep-alive session. Much cheaper than loading a page in firefox, but only sees the
+    html that is rendered on the server.
+    """
+    _headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0',
+        'Accept': 'text/html,application/xhtml+xml',
+        'Accept-Language': 'de-CH,de;q=0.9,en;q=0.8',
+    }
+
+    def __init__(self, pool_size=10, timeout=10):
+        self._timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def get(self, url):
+        """
+        :return: The html of the page or None if the request failed.
+        """
+        try:
+            with METRICS.span('http_fetch'):
+                response = self._session.get(url, timeout=self._timeout)
+        except requests.RequestException as e:
+            print(f"HTTP request to {url} failed: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return response.text
+
+    def close(self):
+        self._session.close()
@@ -1,8 +1,31 @@
+import functools
+import inspect
+import time
+
+from src.utils.metrics import METRICS
+
+
 def log_execution(func):
+    # times the function as span 'function' (see METRICS.print_summary) and logs its start and duration.
+    # generator functions are timed until the generator is exhausted, not just until it is created
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            print(f"Execution of {func.__name__} started")
+            start = time.perf_counter()
+            with METRICS.span('function', function=func.__name__):
+                yield from func(*args, **kwargs)
+            print(f"Execution of {func.__name__} finished in {time.perf_counter() - start:.1f}s")
+
+        return generator_wrapper
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         print(f"Execution of {func.__name__} started")
-        result = func(*args, **kwargs)
-        print(f"Execution of {func.__name__} finished")
+        start = time.perf_counter()
+        with METRICS.span('function', function=func.__name__):
+            result = func(*args, **kwargs)
+        print(f"Execution of {func.__name__} finished in {time.perf_counter() - start:.1f}s")
         return result
 
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# upper bounds (seconds) of the latency histogram buckets, from a cached parse to a slow page load
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+
+class Metrics:
+    """
+    Thread-safe counters and latency histograms of a run, e.g. of the page loads, waits, parses, driver restarts,
+    translations and NER calls.
+
+    A span times a block of code and observes its duration in the histogram of the same name. Every metric can
+    carry labels (e.g. the category), the metrics can be exported as json and as Prometheus textfile
+    (for the textfile collector of the node exporter), and print_summary shows where the wall-clock time went.
+    """
+
+    def __init__(self, prefix='cip'):
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(_DEFAULT_BUCKETS)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'started': self._started,
+                'duration_seconds': time.time() - self._started,
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self._counters.items()],
+                'histograms': [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                                'sum': histogram.sum, 'max': histogram.max,
+                                'buckets': dict(zip(histogram.buckets, histogram.bucket_counts))}
+                               for (name, labels), histogram in self._histograms.items()]
+            }
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.to_dict(), indent=2))
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f"{self._prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, labels), value in self._counters.items():
+                    if counter_name == name:
+                        lines.append(f"{metric}{self._labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                metric = f"{self._prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram_name, labels), histogram in self._histograms.items():
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{self._labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{metric}_bucket{self._labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{metric}_sum{self._labels(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{self._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        self._write(path, self.to_prometheus())
+
+    def print_summary(self):
+        """
+        Prints where the wall-clock time of the run went (per span, largest first) and the articles/minute
+        of every scraped category.
+        """
+        data = self.to_dict()
+        duration = data['duration_seconds']
+        print(f"Run took {duration:.1f}s")
+        spans = {}
+        for histogram in data['histograms']:
+            if histogram['name'] == 'category':
+                continue  # shown as articles/minute below
+            name = histogram['name'] + self._labels(tuple(histogram['labels'].items()))
+            span = spans.setdefault(name, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            span['count'] += histogram['count']
+            span['sum'] += histogram['sum']
+            span['max'] = max(span['max'], histogram['max'])
+        # spans of worker threads overlap, so their sum can be larger than the wall-clock time
+        for name, span in sorted(spans.items(), key=lambda item: item[1]['sum'], reverse=True):
+            print(f"  {name}: {span['sum']:.1f}s ({span['sum'] / duration * 100:.1f}% of the run), {span['count']} "
+                  f"times, {span['sum'] / span['count']:.3f}s avg, {span['max']:.3f}s max")
+
+        for counter in data['counters']:
+            if counter['name'] != 'articles':
+                print(f"  {counter['name']}{self._labels(tuple(counter['labels'].items()))}: {counter['value']}")
+        for histogram in data['histograms']:
+            if histogram['name'] == 'category' and histogram['sum'] > 0:
+                articles = self.counter('articles', **histogram['labels'])
+                print(f"  {histogram['labels'].get('category')}: {articles} articles in {histogram['sum']:.1f}s, "
+                      f"{articles / histogram['sum'] * 60:.1f} articles/minute")
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+    def _labels(self, labels):
+        if not labels:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+    def _write(self, path, text):
+        # atomic, the textfile collector must never read a half written file
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+
+
+# metrics of the current run, shared by the scrapers, the preprocessors and the utilities
+METRICS = Metrics()
@@ -0,0 +1,166 @@
+import os
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet output is optional
+    pa = pq = None
+
+
+class CsvSink:
+    """
+    Appends rows to a csv file in batches instead of keeping the whole dataset in memory.
+
+    Rows are buffered and written once flush_rows rows were collected or flush_seconds passed since the last write.
+    Everything is written to '<path>.part' first, which is only renamed to path by finalize(), so a crashed run
+    never leaves a half written file behind under the final name.
+    """
+
+    def __init__(self, path, columns, separator='|', flush_rows=200, flush_seconds=30):
+        self.path = path
+        self._part_path = path + '.part'
+        self._columns = columns
+        self._separator = separator
+        self._flush_rows = flush_rows
+        self._flush_seconds = flush_seconds
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+        self._file = open(self._part_path, 'w', encoding='utf-8', newline='')
+        pd.DataFrame(columns=columns).to_csv(self._file, sep=separator, index=False)  # header
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self._flush_rows or time.monotonic() - self._last_flush >= self._flush_seconds:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            pd.DataFrame(self._buffer, columns=self._columns).to_csv(self._file, sep=self._separator, index=False,
+                                                                     header=False)
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def finalize(self):
+        """
+        Writes the remaining rows and atomically moves the file to its final path.
+
+        :return: The path of the written file.
+        """
+        self.flush()
+        self._file.close()
+        os.replace(self._part_path, self.path)
+        return self.path
+
+    def close(self):
+        # keeps what was written so far in the .part file, e.g. after a crash
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.close()
+        return False
+
+
+class ParquetSink:
+    """
+    Appends rows to a parquet file, one row group per batch, with typed columns.
+
+    The file is written into a hive style partition directory (e.g. raw/source=galaxus/scrape_date=2024-10-10),
+    so pyarrow and pandas can load single partitions and columns only. Like CsvSink, rows are buffered and the file
+    only gets its final name in finalize(). Until then it is prefixed with '_', which dataset readers ignore.
+    finalize() replaces the files of earlier runs in the partition, so a rerun on the same day does not add the
+    same rows a second time.
+    """
+
+    def __init__(self, directory, columns, partition=None, float_columns=(), dictionary_columns=(),
+                 flush_rows=200, flush_seconds=30):
+        if pq is None:
+            raise ImportError("pyarrow is required for the parquet output")
+        for key, value in (partition or {}).items():
+            directory = os.path.join(directory, f"{key}={value}")
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        file_name = f"part-{time.strftime('%H%M%S')}-{os.getpid()}.parquet"
+        self.path = os.path.join(directory, file_name)
+        self._part_path = os.path.join(directory, '_' + file_name)
+        self._schema = pa.schema([
+            pa.field(column,
+                     pa.float64() if column in float_columns
+                     else pa.dictionary(pa.int32(), pa.string()) if column in dictionary_columns
+                     else pa.string())
+            for column in columns])
+        self._flush_rows = flush_rows
+        self._flush_seconds = flush_seconds
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+        self._writer = pq.ParquetWriter(self._part_path, self._schema, compression='zstd')
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self._flush_rows or time.monotonic() - self._last_flush >= self._flush_seconds:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            arrays = [pa.array([self._convert(row.get(field.name), field.type) for row in self._buffer],
+                               type=field.type)
+                      for field in self._schema]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def finalize(self):
+        self.flush()
+        self._writer.close()
+        # the finished and unfinished files of earlier runs, this run wrote all rows of the partition
+        # (a resumed run writes the rows of the crashed run again)
+        for file_name in os.listdir(self._directory):
+            file_path = os.path.join(self._directory, file_name)
+            if file_name.endswith('.parquet') and file_path != self._part_path:
+                os.remove(file_path)
+        os.replace(self._part_path, self.path)
+        return self.path
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def _convert(self, value, field_type):
+        if value is None:
+            return None
+        if pa.types.is_floating(field_type):
+            return float(value)
+        return str(value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.close()
+        return False
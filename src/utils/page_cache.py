@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+
+class PageCacheMiss(Exception):
+    """
+    Raised in replay mode when a page is not in the cache.
+    """
+
+    def __init__(self, url, state):
+        super().__init__(f"Page {url} (state '{state}') is not in the page cache")
+        self.url = url
+        self.state = state
+
+
+class PageCache:
+    """
+    Persistent cache of html pages on disk.
+
+    Pages are keyed by their URL and the interaction state of the page (e.g. 'loaded' or 'reviews' after the
+    reviews were opened) and stored gzip compressed. Entries expire after ttl seconds. If the cache grows beyond
+    max_size_mb, the least recently used pages are evicted. In replay mode, expired pages are served as well and a
+    missing page raises PageCacheMiss instead of being fetched, the scrapers skip such a page (see replay_misses in
+    the metrics). Replay covers the pages the scrapers cache: the category tree, the listing pages of interdiscount
+    and the article pages. The category pages the filters are clicked on (brands, galaxus sub categories and the
+    galaxus listing) are still opened in the live browser, so a replay is not completely offline.
+    """
+
+    def __init__(self, directory=os.path.join('data', 'page_cache'), ttl=7 * 24 * 3600, max_size_mb=2048,
+                 replay=False):
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size_mb * 1024 * 1024
+        self.replay = replay
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._files())
+
+    def get(self, url, state='loaded'):
+        """
+        :return: The html of the page or None if it is not cached (or expired).
+        """
+        path = self._path(url, state)
+        try:
+            modified = os.path.getmtime(path)
+            if not self.replay and time.time() - modified > self._ttl:
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                html = file.read()
+            os.utime(path, (time.time(), modified))  # the access time is used for the LRU eviction
+            return html
+        except (OSError, EOFError):
+            return None
+
+    def put(self, url, html, state='loaded'):
+        if self.replay:
+            return
+        path = self._path(url, state)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as file:
+            file.write(html)
+        with self._lock:
+            if os.path.exists(path):
+                self._size -= os.path.getsize(path)
+            os.replace(tmp_path, path)  # atomic, a crash never leaves a half written page behind
+            self._size += os.path.getsize(path)
+            if self._size > self._max_size:
+                self._evict()
+
+    def _evict(self):
+        # removes the least recently used pages until the cache is at 90% of its maximum size
+        files = sorted(self._files(), key=os.path.getatime)
+        for path in files:
+            if self._size <= self._max_size * 0.9:
+                break
+            self._size -= os.path.getsize(path)
+            os.remove(path)
+
+    def _files(self):
+        for root, _, file_names in os.walk(self._directory):
+            for file_name in file_names:
+                if file_name.endswith('.html.gz'):
+                    yield os.path.join(root, file_name)
+
+    def _path(self, url, state):
+        key = hashlib.sha256(f"{url}\n{state}".encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, key[:2], key + '.html.gz')
@@ -0,0 +1,45 @@
+import os
+
+from src.model.brand_index import BrandIndex
+from src.utils.category_tree_cache import CategoryTreeCache
+from src.utils.checkpoint_store import CheckpointStore
+from src.utils.metrics import METRICS
+from src.utils.page_cache import PageCache
+from src.utils.web_driver_factory import DRIVER_PROFILES
+
+
+def run_scrape(site, scraper_class, base_url, workers=1, cache_dir=None, replay=False, resume=False,
+               output_format='csv', category_ttl=24, driver_profile='default', preprocessor_class=None,
+               chunk_size=None, processes=1, **scraper_options):
+    """
+    Runs a scraper with the page cache, the checkpoints and the category tree cache of the site in data/ of the
+    working directory, preprocesses the scraped articles and writes the metrics of the run. Used by the mains of
+    the sites and by the jobs, so they all run the same way.
+
+    :param site: Name of the site, e.g. 'interdiscount', used for the files in data/.
+    :param category_ttl: Hours until the cached category tree is refreshed.
+    :param driver_profile: Name of a DriverProfile, see DRIVER_PROFILES.
+    :param preprocessor_class: Preprocessor of the site (called with the brand index of the scraped brands), the
+    scraped articles are not preprocessed if None.
+    :param scraper_options: Further arguments of the scraper, e.g. async_fetch or selection.
+    :return: The path of the scraped file.
+    """
+    page_cache = PageCache(cache_dir, replay=replay) if cache_dir else None
+    checkpoints = CheckpointStore(os.path.join('data', f'{site}_checkpoint.sqlite'), resume=resume)
+    category_cache = CategoryTreeCache(os.path.join('data', f'{site}_categories.json'), ttl=category_ttl * 3600)
+    scraper = scraper_class(base_url, workers=workers, page_cache=page_cache, checkpoints=checkpoints,
+                            output_format=output_format, category_cache=category_cache,
+                            driver_profile=DRIVER_PROFILES[driver_profile], **scraper_options)
+    raw_path = scraper.scrape()
+
+    if preprocessor_class is not None:
+        # the brands collected while scraping (brands.csv) are recognized in the product names without NER
+        brands_path = os.path.join('data', 'brands' if output_format == 'parquet' else 'brands.csv')
+        brand_index = BrandIndex.from_file(brands_path) if os.path.exists(brands_path) else None
+        preprocessor_class(raw_path, output_format=output_format, chunk_size=chunk_size, resume=resume,
+                           processes=processes, brand_index=brand_index).process()
+
+    # where the time of the run went, as json and for the textfile collector of the prometheus node exporter
+    METRICS.write_json(os.path.join('data', f'{site}_metrics.json'))
+    METRICS.write_prometheus(os.path.join('data', f'{site}_metrics.prom'))
+    return raw_path
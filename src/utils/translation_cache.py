@@ -0,0 +1,85 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class TranslationCache:
+    """
+    Persistent memo of translations in SQLite, keyed by source language, target language and the hash of the text.
+
+    The database runs in WAL mode, so several preprocessors (threads or processes) can share it, and it survives
+    between runs. Each distinct string is only sent to the translator once. If the cache holds more than
+    max_entries translations, the least recently used ones are evicted.
+    """
+
+    _touch_interval = 24 * 3600  # last_used is only updated once a day per entry, a hit is a read then
+    _evict_interval = 1000  # check the size of the cache every n inserts
+
+    def __init__(self, path=os.path.join('data', 'translation_cache.sqlite'), max_entries=1_000_000):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._path = path
+        self._max_entries = max_entries
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations (source TEXT, target TEXT, text_hash TEXT, translation TEXT, "
+            "last_used REAL, PRIMARY KEY (source, target, text_hash))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._connection.commit()
+
+    def get(self, source, target, text):
+        """
+        :return: The cached translation of the text, None if it was not translated yet.
+        """
+        key = (source, target, self._hash(text))
+        now = time.time()
+        with self._lock:
+            result = self._connection.execute(
+                "SELECT translation, last_used FROM translations WHERE source = ? AND target = ? AND text_hash = ?",
+                key).fetchone()
+            if result is None:
+                return None
+            if now - result[1] > self._touch_interval:
+                self._connection.execute(
+                    "UPDATE translations SET last_used = ? WHERE source = ? AND target = ? AND text_hash = ?",
+                    (now,) + key)
+                self._connection.commit()
+        return result[0]
+
+    def put(self, source, target, text, translation):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO translations (source, target, text_hash, translation, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, target, self._hash(text), translation, time.time()))
+            self._inserts += 1
+            if self._inserts % self._evict_interval == 0:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        # removes the least recently used translations until the cache is at 90% of its maximum size
+        count = self._connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self._max_entries:
+            self._connection.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                (count - int(self._max_entries * 0.9),))
+
+    def _hash(self, text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def close(self):
+        self._connection.close()
+
+    # the cache can be handed to worker processes, which open their own connection to the same database
+    def __getstate__(self):
+        return {'path': self._path, 'max_entries': self._max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
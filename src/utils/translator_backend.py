@@ -0,0 +1,62 @@
+import time
+from abc import ABC, abstractmethod
+
+try:
+    from deep_translator import GoogleTranslator
+except ImportError:  # only needed for the google backend
+    GoogleTranslator = None
+
+
+class TranslatorBackend(ABC):
+    """
+    Translates batches of texts from the source to the target language. A single request must not be longer than
+    max_chars, the BatchTranslator packs the texts accordingly.
+    """
+    max_chars = 5000
+
+    def __init__(self, source='de', target='en'):
+        self.source = source
+        self.target = target
+
+    @abstractmethod
+    def translate_batch(self, texts):
+        """
+        :param texts: List of texts, each without line breaks. Together at most max_chars long (joined by newlines).
+        :return: List of the translated texts, in the same order.
+        """
+        pass
+
+
+class GoogleTranslatorBackend(TranslatorBackend):
+    def __init__(self, source='de', target='en'):
+        if GoogleTranslator is None:
+            raise ImportError("deep_translator is required for the google translator backend")
+        super().__init__(source, target)
+        self._translator = GoogleTranslator(source=source, target=target)
+
+    def translate_batch(self, texts):
+        # the whole batch is sent as one request, one text per line. google keeps the line breaks, but if the
+        # number of lines does not match, the texts are translated one by one instead
+        translated = (self._translator.translate("\n".join(texts)) or '').split("\n")
+        if len(translated) != len(texts):
+            return [self._translator.translate(text) or '' for text in texts]
+        return [text.strip() for text in translated]
+
+
+class LocalTranslatorBackend(TranslatorBackend):
+    """
+    Offline stand-in for tests and benchmarks. Translates word by word with the given dictionary and keeps unknown
+    words, optionally sleeping latency seconds per request like a remote translator would.
+    """
+
+    def __init__(self, source='de', target='en', dictionary=None, latency=0):
+        super().__init__(source, target)
+        self._dictionary = dictionary or {}
+        self._latency = latency
+        self.requests = 0
+
+    def translate_batch(self, texts):
+        self.requests += 1
+        if self._latency:
+            time.sleep(self._latency)
+        return [" ".join(self._dictionary.get(word, word) for word in text.split(" ")) for text in texts]
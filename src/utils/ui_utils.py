@@ -1,5 +1,8 @@
-import tkinter as tk
-from tkinter import messagebox, ttk
+try:
+    import tkinter as tk
+    from tkinter import messagebox, ttk
+except ImportError:  # headless servers run job specs instead of the dialogs, see src/jobs
+    tk = messagebox = ttk = None
 
 
 class UIUtils:
@@ -189,4 +192,23 @@ class UIUtils:
         return selected_categories
 
 
+class DialogSelection:
+    """
+    Asks for the categories, sub categories and brands to scrape in Tk dialogs. The scrapers use a JobSpec
+    (src/jobs/job_spec.py) with the same methods instead when they run without a display.
+    """
 
+    def __init__(self, category_levels=2):
+        self._category_levels = category_levels  # levels of the category tree that are shown
+
+    def select_categories(self, categories):
+        title = "Select the categories that you want to scrape"
+        if self._category_levels == 3:
+            return UIUtils.show_selection_window_dropdown_3_levels(categories, title)
+        return UIUtils.show_selection_window_dropdown(categories, title)
+
+    def select_sub_categories(self, category, sub_categories):
+        return UIUtils.show_selection_window(sub_categories, "Select the subcategories that you want to scrape")
+
+    def select_brands(self, category, brands):
+        return UIUtils.show_selection_window(brands, "Select the brands that you want to scrape")
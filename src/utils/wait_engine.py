@@ -0,0 +1,139 @@
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.utils.metrics import METRICS
+
+# Installs a MutationObserver (once per document) and returns the milliseconds since the last DOM mutation
+_MS_SINCE_LAST_MUTATION_JS = """
+if (!window.__cipLastMutation) {
+    window.__cipLastMutation = performance.now();
+    new MutationObserver(function () { window.__cipLastMutation = performance.now(); })
+        .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+return performance.now() - window.__cipLastMutation;
+"""
+
+# Number of resources the page has requested so far and whether the document finished loading
+_NETWORK_STATE_JS = """
+return [performance.getEntriesByType('resource').length, document.readyState];
+"""
+
+_ELEMENT_CONDITIONS = {
+    'present': EC.presence_of_element_located,
+    'visible': EC.visibility_of_element_located,
+    'clickable': EC.element_to_be_clickable,
+}
+
+
+class WaitProfile:
+    """
+    Timeouts (in seconds) of a website. Every wait returns as soon as its condition is met, the timeouts are
+    only upper bounds.
+    """
+
+    def __init__(self, element_timeout=3, quiet_period=0.3, network_idle_period=0.5, page_timeout=10,
+                 poll_interval=0.05):
+        self.element_timeout = element_timeout  # how long to wait for an element to show up
+        self.quiet_period = quiet_period  # how long the DOM must not change to count as settled
+        self.network_idle_period = network_idle_period  # how long no new request may start to count as idle
+        self.page_timeout = page_timeout  # upper bound for waits on the whole page
+        self.poll_interval = poll_interval
+
+
+class WaitEngine:
+    """
+    Waits for DOM conditions instead of sleeping for a fixed time, and records how long every wait took.
+    The recorded times are grouped by label, so it is visible which waits the scraping time is spent in.
+    """
+
+    def __init__(self, get_driver, profile=None):
+        self._get_driver = get_driver  # callable, so worker threads and recycled drivers are picked up
+        self._profile = profile or WaitProfile()
+        self._timings = {}  # label -> {'count', 'total', 'max', 'timeouts'}
+        self._lock = threading.Lock()
+
+    def element(self, by, value, condition='present', timeout=None, label=None):
+        """
+        Waits until the element is present, visible or clickable.
+
+        :return: The element or None if it did not meet the condition within the timeout.
+        """
+        timeout = self._profile.element_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            element = WebDriverWait(self._get_driver(), timeout, poll_frequency=self._profile.poll_interval) \
+                .until(_ELEMENT_CONDITIONS[condition]((by, value)))
+            self._record(label or f'element_{condition}', start)
+            return element
+        except TimeoutException:
+            self._record(label or f'element_{condition}', start, timed_out=True)
+            return None
+
+    def dom_quiet(self, quiet_period=None, timeout=None, label='dom_quiet'):
+        """
+        Waits until the DOM did not change for quiet_period seconds (e.g. after a click or a scroll).
+        """
+        timeout = self._profile.page_timeout if timeout is None else timeout
+        quiet_period = min(self._profile.quiet_period if quiet_period is None else quiet_period, timeout)
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < timeout:
+                if self._get_driver().execute_script(_MS_SINCE_LAST_MUTATION_JS) >= quiet_period * 1000:
+                    self._record(label, start)
+                    return True
+                time.sleep(self._profile.poll_interval)
+        except WebDriverException:
+            pass  # e.g. the page navigated away while waiting
+        self._record(label, start, timed_out=True)
+        return False
+
+    def network_idle(self, idle_period=None, timeout=None, label='network_idle'):
+        """
+        Waits until the document is loaded and no new resource was requested for idle_period seconds.
+        """
+        timeout = self._profile.page_timeout if timeout is None else timeout
+        idle_period = self._profile.network_idle_period if idle_period is None else idle_period
+        start = time.perf_counter()
+        last_count, last_change = -1, start
+        try:
+            while time.perf_counter() - start < timeout:
+                count, ready_state = self._get_driver().execute_script(_NETWORK_STATE_JS)
+                now = time.perf_counter()
+                if count != last_count:
+                    last_count, last_change = count, now
+                elif ready_state == 'complete' and now - last_change >= idle_period:
+                    self._record(label, start)
+                    return True
+                time.sleep(self._profile.poll_interval)
+        except WebDriverException:
+            pass
+        self._record(label, start, timed_out=True)
+        return False
+
+    def timings(self):
+        with self._lock:
+            return {label: dict(timing) for label, timing in self._timings.items()}
+
+    def print_summary(self):
+        timings = sorted(self.timings().items(), key=lambda item: item[1]['total'], reverse=True)
+        print(f"Time spent waiting: {sum(timing['total'] for _, timing in timings):.1f}s")
+        for label, timing in timings:
+            print(f"  {label}: {timing['count']} waits, {timing['total']:.1f}s total, "
+                  f"{timing['total'] / timing['count']:.3f}s avg, {timing['max']:.3f}s max, "
+                  f"{timing['timeouts']} timeouts")
+
+    def _record(self, label, start, timed_out=False):
+        duration = time.perf_counter() - start
+        with self._lock:
+            timing = self._timings.setdefault(label, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            timing['count'] += 1
+            timing['total'] += duration
+            timing['max'] = max(timing['max'], duration)
+            timing['timeouts'] += int(timed_out)
+        METRICS.observe('wait', duration, label=label)
+        if timed_out:
+            METRICS.increment('wait_timeouts', label=label)
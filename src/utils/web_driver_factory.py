@@ -1,18 +1,208 @@
+import base64
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 
+from src.utils.metrics import METRICS
+
+try:
+    import psutil
+except ImportError:  # without psutil, drivers are only recycled by their page count
+    psutil = None
+
+# ads, analytics and tracking, plus web fonts and videos, which none of the scrapers reads
+BLOCKED_URLS = ['*google-analytics.com/*', '*googletagmanager.com/*', '*doubleclick.net/*', '*facebook.net/*',
+                '*hotjar.com/*', '*criteo.com/*', '*bing.com/*', '*/analytics/*',
+                '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm']
+
+
+class DriverProfile:
+    """
+    How the browser loads pages. The leaner the profile, the less the browser downloads and renders per page, but
+    the more likely a page misses something the scraper waits for. benchmarks/driver_profile_benchmark.py measures
+    the load time per page of every profile and checks that the fields of the articles are still rendered.
+    """
+
+    def __init__(self, name, page_load_strategy='normal', blocked_urls=(), disable_images=True, disable_fonts=False,
+                 disable_cache=False, disable_animations=False, window_size=None):
+        self.name = name
+        # 'normal' waits for all resources of the page, 'eager' only until the DOM is parsed. 'none' is not
+        # supported, the scrapers read the page source right after loading a page
+        self.page_load_strategy = page_load_strategy
+        self.blocked_urls = list(blocked_urls)  # shell expression patterns (PAC shExpMatch) of urls not to load
+        self.disable_images = disable_images
+        self.disable_fonts = disable_fonts  # use the system fonts instead of downloading web fonts
+        self.disable_cache = disable_cache  # no disk cache, the pages are only loaded once anyway
+        self.disable_animations = disable_animations  # no transitions to wait for before elements are clickable
+        self.window_size = window_size  # (width, height), maximized if None
+
+    def __repr__(self):
+        return f"DriverProfile(name={self.name})"
+
+
+DRIVER_PROFILES = {
+    'default': DriverProfile('default'),
+    'eager': DriverProfile('eager', page_load_strategy='eager'),
+    'lean': DriverProfile('lean', page_load_strategy='eager', blocked_urls=BLOCKED_URLS, disable_fonts=True,
+                          disable_cache=True, disable_animations=True, window_size=(1280, 900)),
+    # also without stylesheets, pages that hide elements until their css is loaded might not become clickable
+    'minimal': DriverProfile('minimal', page_load_strategy='eager', blocked_urls=BLOCKED_URLS + ['*.css', '*.css?*'],
+                             disable_fonts=True, disable_cache=True, disable_animations=True, window_size=(1024, 768)),
+}
+
+
 class WebDriverFactory:
     @staticmethod
-    def create_driver(headless=True, disable_images=True):
-        profile = FirefoxProfile()
-        if disable_images:
-            profile.set_preference("permissions.default.image", 2)  # Disable images
+    def create_driver(headless=True, profile=None):
+        profile = profile or DRIVER_PROFILES['default']
+        firefox_profile = FirefoxProfile()
+        if profile.disable_images:
+            firefox_profile.set_preference("permissions.default.image", 2)  # Disable images
+        if profile.disable_fonts:
+            firefox_profile.set_preference("browser.display.use_document_fonts", 0)
+        if profile.disable_cache:
+            firefox_profile.set_preference("browser.cache.disk.enable", False)
+            firefox_profile.set_preference("browser.cache.offline.enable", False)
+        if profile.disable_animations:
+            firefox_profile.set_preference("ui.prefersReducedMotion", 1)
+            firefox_profile.set_preference("toolkit.cosmeticAnimations.enabled", False)
+            firefox_profile.set_preference("image.animation_mode", "none")
+        if profile.blocked_urls:
+            WebDriverFactory._block_urls(firefox_profile, profile.blocked_urls)
 
         options = Options()
-        options.profile = profile
+        options.profile = firefox_profile
         options.headless = headless  # Enable headless mode by default
+        options.page_load_strategy = profile.page_load_strategy
 
         driver = webdriver.Firefox(options=options)
-        driver.maximize_window()
+        if profile.window_size:
+            driver.set_window_size(*profile.window_size)
+        else:
+            driver.maximize_window()
         return driver
+
+    @staticmethod
+    def _block_urls(firefox_profile, patterns):
+        # firefox has no blocklist preference, so a proxy auto-config sends the blocked urls to a closed port, where
+        # they fail right away, and loads everything else directly
+        pac = ("function FindProxyForURL(url, host) {"
+               f"  var blocked = {json.dumps(patterns)};"
+               "  for (var i = 0; i < blocked.length; i++) {"
+               "    if (shExpMatch(url, blocked[i])) return 'PROXY 127.0.0.1:9';"
+               "  }"
+               "  return 'DIRECT';"
+               "}")
+        firefox_profile.set_preference("network.proxy.type", 2)
+        firefox_profile.set_preference("network.proxy.autoconfig_url",
+                                       "data:application/x-ns-proxy-autoconfig;base64,"
+                                       + base64.b64encode(pac.encode('utf-8')).decode('ascii'))
+        firefox_profile.set_preference("network.proxy.autoconfig_url.include_path", True)  # match paths of https urls
+        firefox_profile.set_preference("network.proxy.allow_hijacking_localhost", True)  # e.g. the mock retailer
+
+
+class WebDriverPool:
+    """
+    Hands out warm drivers and recycles them in the background.
+
+    A driver is checked whenever it is checked out or renewed: if it loaded more than max_pages pages or its
+    firefox processes use more than max_rss_mb of memory, it is quit in a background thread and a warm driver
+    from the pool is handed out instead. A replacement is launched right away, so the scrape loop never waits
+    for a cold start as long as the pool holds a spare driver.
+    """
+
+    def __init__(self, size=2, max_pages=300, max_rss_mb=1500, create_driver=WebDriverFactory.create_driver):
+        self._create_driver = create_driver
+        self._max_pages = max_pages
+        self._max_rss_bytes = max_rss_mb * 1024 * 1024
+        self._idle = queue.Queue()
+        self._page_counts = {}  # id(driver) -> number of pages loaded
+        self._lock = threading.Lock()
+        self._closed = False
+        self._background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="driver-pool")
+        for _ in range(size):
+            self._background.submit(self._prewarm)
+
+    def checkout(self):
+        # blocks until a warm, healthy driver is available, raises the error if a driver could not be started
+        while True:
+            driver = self._idle.get()
+            if isinstance(driver, Exception):
+                raise driver
+            if self._is_healthy(driver):
+                return driver
+            self._recycle(driver)
+
+    def checkin(self, driver):
+        if self._closed:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+
+    def renew(self, driver):
+        """
+        Returns the given driver if it is still healthy, otherwise a warm replacement from the pool.
+        The unhealthy driver is quit in the background.
+        """
+        if self._is_healthy(driver):
+            return driver
+        self._recycle(driver)
+        return self.checkout()
+
+    def record_page(self, driver):
+        with self._lock:
+            self._page_counts[id(driver)] = self._page_counts.get(id(driver), 0) + 1
+
+    def close(self):
+        self._closed = True
+        self._background.shutdown(wait=True)
+        while not self._idle.empty():
+            driver = self._idle.get_nowait()
+            if not isinstance(driver, Exception):
+                self._quit(driver)
+
+    def _is_healthy(self, driver):
+        with self._lock:
+            pages = self._page_counts.get(id(driver), 0)
+        if pages >= self._max_pages:
+            return False
+        return self._rss(driver) < self._max_rss_bytes
+
+    def _rss(self, driver):
+        # memory of geckodriver and all the firefox processes it started
+        if psutil is None:
+            return 0
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            return sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+        except (AttributeError, psutil.Error):
+            return 0
+
+    def _recycle(self, driver):
+        print("Recycling driver")
+        METRICS.increment('driver_restarts')
+        self._background.submit(self._quit, driver)
+        self._background.submit(self._prewarm)
+
+    def _prewarm(self):
+        if not self._closed:
+            try:
+                with METRICS.span('driver_start'):
+                    driver = self._create_driver()
+            except Exception as e:
+                # handed to the next checkout, which would otherwise wait forever for this driver
+                driver = e
+            self._idle.put(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            self._page_counts.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            print("Driver could not be quit", e)
@@ -0,0 +1,12 @@
+from src.model.category import Category
+from src.utils.category_tree_cache import CategoryTreeCache
+
+
+def test_tree_of_another_key_is_not_loaded(tmp_path):
+    cache = CategoryTreeCache(str(tmp_path / 'categories.json'))
+    cache.save([Category('TV & Audio', '/de/category/tv-audio', [])], key=['TV & Audio'])
+
+    categories, expired = cache.load(key=['TV & Audio'])
+    assert [category.name for category in categories] == ['TV & Audio'] and not expired
+    assert cache.load(key=['Haushalt']) is None
+    assert cache.load() is None
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("pandas")
+pytest.importorskip("selenium")
+
+from src.galaxus.scraper import Scraper  # noqa: E402
+from src.utils.html_parser import parse_html  # noqa: E402
+
+
+def test_harvest_article_links_keeps_tiles_missing_in_the_structured_data():
+    scraper = Scraper.__new__(Scraper)  # only the parsing is used, no driver is started
+    scraper._base_url = "http://www.galaxus.ch"
+    html = ('<script type="application/ld+json">{"@type": "ItemList", "itemListElement": ["/en/s1/product/a-1"]}'
+            '</script>'
+            '<article class="sc-328a7c4f-1 dBtYoI"><a href="/en/s1/product/a-1">A</a></article>'
+            '<article class="sc-328a7c4f-1 dBtYoI"><a href="/en/s1/product/b-2">B</a></article>')
+
+    links = scraper._harvest_article_links(parse_html(html))
+
+    assert links == ["http://www.galaxus.ch/en/s1/product/a-1", "http://www.galaxus.ch/en/s1/product/b-2"]
@@ -0,0 +1,39 @@
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("pandas")
+pytest.importorskip("selenium")
+
+from benchmarks.mock_retailer import MockRetailer  # noqa: E402
+from src.galaxus.page_selectors import SELECTORS  # noqa: E402
+from src.galaxus.scraper import Scraper  # noqa: E402
+from src.utils.html_parser import parse_html  # noqa: E402
+
+
+def galaxus_scraper(base_url):
+    # only the parsing of the listing is used, no driver is started
+    scraper = Scraper.__new__(Scraper)
+    scraper._base_url = base_url
+    return scraper
+
+
+def test_galaxus_listing_with_take_shows_the_whole_category():
+    with MockRetailer('galaxus', products=150) as retailer:
+        scraper = galaxus_scraper(retailer.base_url)
+        # the url after Apply, the scraper appends &take=N to it
+        listing_url = retailer.base_url + '/en/s1/category/electronics?filter='
+        soup = parse_html(urlopen(listing_url).read())
+        product_count = int(SELECTORS['product_count'].select_one(soup).text.split(" of ")[1].split()[0])
+        assert len(scraper._harvest_article_links(soup)) == 24
+
+        soup = parse_html(urlopen(listing_url + f'&take={Scraper._take_amount(product_count)}').read())
+        assert len(scraper._harvest_article_links(soup)) == product_count == 150
+
+
+def test_galaxus_listing_without_query_is_not_found():
+    with MockRetailer('galaxus') as retailer:
+        with pytest.raises(HTTPError):
+            urlopen(retailer.base_url + '/en/s1/category/electronics&take=144')
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from src.model.base_preprocessor import BasePreProcessor  # noqa: E402
+from src.utils.output_sink import ParquetSink  # noqa: E402
+
+
+class SourcePreProcessor(BasePreProcessor):
+    def process(self):
+        return self._process_and_save('preprocessed')
+
+    def _process_frame(self, df):
+        df['source'] = 'interdiscount'
+        return df
+
+
+def scrape(rows):
+    partition = {'source': 'interdiscount', 'scrape_date': '2024-10-10'}
+    with ParquetSink(os.path.join('data', 'raw'), ['name', 'price'], partition, float_columns=['price']) as sink:
+        sink.write_many({'name': f'article {i}', 'price': i} for i in range(rows))
+    return sink.path
+
+
+@pytest.mark.parametrize('chunk_size', [None, 7])
+def test_rerun_on_the_same_day_replaces_the_partition(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.chdir(tmp_path)
+    earlier_day = os.path.join('data', 'preprocessed', 'source=interdiscount', 'scrape_date=2024-10-09')
+    os.makedirs(earlier_day)
+    pd.DataFrame({'name': ['article'], 'price': [1.0]}).to_parquet(os.path.join(earlier_day, 'part.parquet'))
+
+    for _ in range(2):
+        path = SourcePreProcessor(scrape(50), output_format='parquet', chunk_size=chunk_size).process()
+
+    assert len(pd.read_parquet(os.path.join('data', 'raw'))) == 50
+    rows_per_day = pd.read_parquet(path).groupby('scrape_date', observed=True).size().to_dict()
+    assert rows_per_day == {'2024-10-09': 1, '2024-10-10': 50}
+
+
+def test_empty_scrape_is_preprocessed_with_several_processes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    path = SourcePreProcessor(scrape(0), output_format='csv', processes=2).process()
+
+    assert len(pd.read_csv(path, sep='|')) == 0
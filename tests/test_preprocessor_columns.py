@@ -0,0 +1,28 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("spacy")
+
+from src.interdiscount.preprocessor import PreProcessor  # noqa: E402
+
+
+def column_preprocessor(recognized_brands):
+    # no file, no translator and no spaCy model, the NER results are already memoized
+    preprocessor = PreProcessor.__new__(PreProcessor)
+    preprocessor._brand_index = None
+    preprocessor._recognized_brands = dict(recognized_brands)
+    return preprocessor
+
+
+def test_process_columns_without_brand_index_hits():
+    preprocessor = column_preprocessor({'SONY': 'SONY', 'JBL': None})
+    df = pd.DataFrame({
+        'name': ['SONY WH-1000XM5 Kopfhörer', 'JBL Flip 6', 'Samsung Galaxy S24'],
+        'brand': ['', '', 'Samsung'],
+        'description': ['"Kabellos"', 'Wasserdicht', 'Smartphone'],
+    })
+
+    df = preprocessor._process_columns(df)
+
+    assert df['brand'].tolist() == ['SONY', 'JBL', 'Samsung']
+    assert df['name'].tolist() == ['WH-1000XM5 Kopfhörer', 'Flip 6', 'Galaxy S24']
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("psutil")
+
+from src.utils.web_driver_factory import WebDriverPool  # noqa: E402
+
+
+def test_checkout_raises_if_the_driver_cannot_be_started():
+    def create_driver():
+        raise RuntimeError("geckodriver not found")
+
+    pool = WebDriverPool(size=1, create_driver=create_driver)
+    with pytest.raises(RuntimeError, match="geckodriver not found"):
+        pool.checkout()
+    pool.close()
+
+
+def test_checkout_returns_a_started_driver():
+    class FakeDriver:
+        def quit(self):
+            pass
+
+    pool = WebDriverPool(size=1, create_driver=FakeDriver)
+    assert isinstance(pool.checkout(), FakeDriver)
+    pool.close()